@@ -0,0 +1,128 @@
+"""
+Closed-loop actuator bridge
+Routes automation/<device_type>/<location> commands to simulated actuators,
+publishes the confirmed state and measures command-to-actuation latency
+"""
+
+import json
+import threading
+from collections import deque
+from datetime import datetime
+
+COMMAND_TOPIC = "automation/+/+"
+
+class ActuatorBridge:
+    """Applies automation commands to devices with set_state and confirms them on state/..."""
+
+    def __init__(self, devices, state_prefix="state", qos=1, window=10000):
+        self.state_prefix = state_prefix
+        self.qos = qos
+        self.client = None
+        self._routes = {}       # (device_type, location) -> [devices]
+        for device in devices:
+            self.add_device(device)
+        self._lock = threading.Lock()
+        self._last_command_id = None
+        # Recent latencies only, so a long run does not grow memory
+        self.latencies = deque(maxlen=window)
+        self.stats = {"commands": 0, "applied": 0, "changed": 0, "unrouted": 0,
+                      "missed": 0, "controller_restarts": 0, "errors": 0}
+
+    def add_device(self, device):
+        key = (device.device_type, device.location)
+        self._routes.setdefault(key, []).append(device)
+
+    def attach(self, client):
+        """Route command messages from this client; call subscribe() on every connect"""
+        self.client = client
+        client.message_callback_add(COMMAND_TOPIC, self.on_command)
+        if client.is_connected():
+            self.subscribe(client)
+
+    def subscribe(self, client):
+        client.subscribe(COMMAND_TOPIC, qos=self.qos)
+
+    def _track_sequence(self, command_id):
+        # Caller holds self._lock
+        last = self._last_command_id
+        if last is not None:
+            if command_id > last + 1:
+                self.stats["missed"] += command_id - last - 1
+            elif command_id <= last:
+                # Ids start over when the controller restarts
+                self.stats["controller_restarts"] += 1
+        self._last_command_id = command_id
+
+    def on_command(self, client, userdata, msg):
+        """paho callback for automation/<device_type>/<location>"""
+        # paho re-raises callback exceptions, which would stop the network loop
+        try:
+            self.handle_command(client, msg)
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            print(f"Error: {e}")
+
+    def handle_command(self, client, msg):
+        received = datetime.now()
+        command = json.loads(msg.payload.decode())
+        _, device_type, location = msg.topic.split('/')
+        if not isinstance(command, dict):
+            raise ValueError(f"command on {msg.topic} is not a JSON object: {command!r}")
+
+        with self._lock:
+            self.stats["commands"] += 1
+            if isinstance(command.get("command_id"), int):
+                self._track_sequence(command["command_id"])
+
+        devices = self._routes.get((device_type, location))
+        if not devices:
+            with self._lock:
+                self.stats["unrouted"] += 1
+            return
+
+        for device in devices:
+            changed = device.apply_command(command)
+            actuated = datetime.now()
+            latency_ms = None
+            if command.get("timestamp"):
+                try:
+                    sent = datetime.fromisoformat(command["timestamp"])
+                    latency_ms = (actuated - sent).total_seconds() * 1000
+                except ValueError:
+                    pass
+            with self._lock:
+                self.stats["applied"] += 1
+                self.stats["changed"] += int(changed)
+                if latency_ms is not None:
+                    self.latencies.append(latency_ms)
+            client.publish(f"{self.state_prefix}/{device.device_type}/{device.device_id}",
+                           json.dumps({
+                               "device_id": device.device_id,
+                               "location": device.location,
+                               "state": "on" if device.state else "off",
+                               "changed": changed,
+                               "command_id": command.get("command_id"),
+                               "command_timestamp": command.get("timestamp"),
+                               "received_at": received.isoformat(),
+                               "timestamp": actuated.isoformat(),
+                           }), qos=self.qos)
+
+    def percentile(self, p):
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def missed_rate(self):
+        """Fraction of controller commands that never arrived"""
+        with self._lock:
+            total = self.stats["commands"] + self.stats["missed"]
+            return self.stats["missed"] / total if total else 0.0
+
+    def summary(self):
+        return (f"{self.stats['commands']} commands, {self.stats['applied']} applied "
+                f"({self.stats['changed']} state changes), {self.stats['missed']} missed "
+                f"({self.missed_rate():.2%}), actuation latency p50 "
+                f"{self.percentile(50):.1f}ms p99 {self.percentile(99):.1f}ms")
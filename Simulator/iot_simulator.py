@@ -9,39 +9,49 @@ import json
 import os
 import sys
 from datetime import datetime
-from dotenv import load_dotenv
-import paho.mqtt.client as mqtt
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
 
 # Add devices directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'devices'))
+# Shared helpers live next to the workshop code
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'code'))
 
-from devices.temperature_sensor import TemperatureSensor
-from devices.humidity_sensor import HumiditySensor
-from devices.smart_switch import SmartSwitch
+from iot_core import get_config, get_instrumentation, mqtt_client, influx_client, sync_write_api
 
-# Load environment variables
-load_dotenv()
+try:
+    from devices.temperature_sensor import TemperatureSensor
+    from devices.humidity_sensor import HumiditySensor
+    from devices.smart_switch import SmartSwitch
+except ImportError:
+    # Device modules sit next to this file in the repository layout
+    from temperature_sensor import TemperatureSensor
+    from humidity_sensor import HumiditySensor
+    from smart_switch import SmartSwitch
+from actuators import ActuatorBridge
 
 # Configuration
-MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
-MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
-INFLUXDB_URL = os.getenv('INFLUXDB_URL', 'http://localhost:8086')
-INFLUXDB_TOKEN = os.getenv('INFLUXDB_TOKEN', 'my-super-secret-auth-token')
-INFLUXDB_ORG = os.getenv('INFLUXDB_ORG', 'iot-org')
-INFLUXDB_BUCKET = os.getenv('INFLUXDB_BUCKET', 'iot-data')
+config = get_config()
+MQTT_BROKER = config.mqtt_broker
+MQTT_PORT = config.mqtt_port
+INFLUXDB_URL = config.influxdb_url
+INFLUXDB_TOKEN = config.influxdb_token
+INFLUXDB_ORG = config.influxdb_org
+INFLUXDB_BUCKET = config.influxdb_bucket
 
 class IoTSimulator:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.devices = []
+        # Optional DeviceRegistry; adds registered metadata as InfluxDB tags
+        self.registry = registry
         self.mqtt_client = None
         self.influx_client = None
+        self.actuators = None
         self.running = False
+        self.metrics = get_instrumentation("iot_simulator")
+        self.metrics.gauge("devices", lambda: len(self.devices))
         
     def setup_mqtt(self):
         """Setup MQTT client with retry logic"""
-        self.mqtt_client = mqtt.Client()
+        self.mqtt_client = mqtt_client()
         self.mqtt_client.on_connect = self.on_mqtt_connect
         self.mqtt_client.on_publish = self.on_mqtt_publish
         
@@ -72,12 +82,9 @@ class IoTSimulator:
     def setup_influxdb(self):
         """Setup InfluxDB client"""
         try:
-            self.influx_client = InfluxDBClient(
-                url=INFLUXDB_URL,
-                token=INFLUXDB_TOKEN,
-                org=INFLUXDB_ORG
-            )
-            self.write_api = self.influx_client.write_api(write_options=SYNCHRONOUS)
+            # memory:// or file:///path runs against the embedded local store
+            self.influx_client = influx_client(INFLUXDB_URL, INFLUXDB_TOKEN, INFLUXDB_ORG)
+            self.write_api = sync_write_api(self.influx_client)
             print(f"Connected to InfluxDB at {INFLUXDB_URL}")
         except Exception as e:
             print(f"Failed to connect to InfluxDB: {e}")
@@ -86,6 +93,8 @@ class IoTSimulator:
         """MQTT connection callback"""
         if rc == 0:
             print("MQTT broker connected successfully")
+            if self.actuators:
+                self.actuators.subscribe(client)
         else:
             print(f"Failed to connect to MQTT broker, return code {rc}")
             # Try to reconnect
@@ -95,6 +104,16 @@ class IoTSimulator:
         """MQTT publish callback"""
         pass
     
+    def setup_actuators(self, devices=None):
+        """Let devices with set_state follow automation/<device_type>/<location> commands"""
+        if devices is None:
+            devices = [d for d in self.devices if hasattr(d, 'apply_command')]
+        self.actuators = ActuatorBridge(devices)
+        if self.mqtt_client:
+            self.actuators.attach(self.mqtt_client)
+        print(f"Following automation commands for {len(devices)} actuators")
+        return self.actuators
+    
     def add_device(self, device):
         """Add a device to the simulator"""
         self.devices.append(device)
@@ -108,23 +127,37 @@ class IoTSimulator:
         
         if self.mqtt_client and self.mqtt_client.is_connected():
             self.mqtt_client.publish(topic, payload)
+            self.metrics.incr("messages_out")
         
         # Write to InfluxDB
         if self.influx_client:
-            point = Point(device.device_type) \
-                .tag("device_id", device.device_id) \
-                .tag("device_type", device.device_type) \
-                .field("value", data.get('value', 0)) \
-                .time(datetime.utcnow())
+            # Dict records work with both InfluxDBClient and LocalTSDB,
+            # so influxdb_client is only imported when it is actually used
+            point = {
+                "measurement": device.device_type,
+                "tags": {"device_id": device.device_id, "device_type": device.device_type},
+                "fields": {"value": data.get('value', 0)},
+                "time": datetime.utcnow()
+            }
+            
+            if self.registry:
+                meta = self.registry.get(device.device_id)
+                if meta:
+                    for tag in ('location', 'device_name'):
+                        if meta.get(tag):
+                            point["tags"][tag] = meta[tag]
             
             # Add additional fields
             for key, value in data.items():
                 if key != 'value':
-                    point.field(key, value)
+                    point["fields"][key] = value
             
             try:
-                self.write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=point)
+                with self.metrics.timer("db_write"):
+                    self.write_api.write(bucket=INFLUXDB_BUCKET, org=INFLUXDB_ORG, record=point)
+                self.metrics.incr("db_writes")
             except Exception as e:
+                self.metrics.incr("db_errors")
                 print(f"Failed to write to InfluxDB: {e}")
     
     def run(self, interval=5):
@@ -138,7 +171,8 @@ class IoTSimulator:
             while self.running:
                 for device in self.devices:
                     data = device.read()
-                    self.publish_data(device, data)
+                    with self.metrics.timer("publish"):
+                        self.publish_data(device, data)
                     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {device.device_id}: {data}")
                 
                 time.sleep(interval)
@@ -154,6 +188,8 @@ class IoTSimulator:
             self.mqtt_client.disconnect()
         if self.influx_client:
             self.influx_client.close()
+        if self.actuators:
+            print(f"Actuators: {self.actuators.summary()}")
         print("Simulator stopped")
 
 def main():
@@ -171,6 +207,9 @@ def main():
     simulator.add_device(HumiditySensor("hum-002", "bedroom"))
     simulator.add_device(SmartSwitch("switch-001", "living-room"))
     simulator.add_device(SmartSwitch("switch-002", "bedroom"))
+    simulator.add_device(SmartSwitch("ac-001", "living-room", device_type="ac", toggle_probability=0))
+    simulator.add_device(SmartSwitch("ac-002", "bedroom", device_type="ac", toggle_probability=0))
+    simulator.setup_actuators()
     
     # Run simulator
     simulator.run(interval=5)
@@ -0,0 +1,440 @@
+"""
+Scenario-driven building simulator
+Vectorized per-room thermal and humidity models with daily cycles, AC response
+to automation/ac/<location> commands and sensor dropouts, fast enough to run
+tens of thousands of devices faster than real time
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Shared helpers live next to the workshop code
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'code'))
+
+from iot_core import get_config, mqtt_client, influx_client, sync_write_api
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+
+SENSOR_TYPES = ("temperature", "humidity")
+UNITS = {"temperature": "celsius", "humidity": "percent"}
+
+# Occupancy by hour of day for weekdays and weekends
+SCHEDULES = {
+    "office": ([0.0] * 7 + [0.3, 0.9, 1.0, 1.0, 1.0, 0.7, 1.0, 1.0, 1.0, 0.9, 0.5] + [0.1] * 6,
+               [0.0] * 24),
+    "home": ([0.8] * 7 + [0.5, 0.2] + [0.1] * 8 + [0.5, 0.9, 1.0, 1.0, 1.0, 0.9, 0.8],
+             [0.8] * 9 + [0.6] * 9 + [0.9] * 6),
+    "always": ([1.0] * 24, [1.0] * 24),
+}
+
+DEFAULT_BUILDING = {
+    "floors": 1,
+    "rooms_per_floor": 4,
+    "schedule": "office",
+    "devices_per_room": {"temperature": 1, "humidity": 1},
+    "leak_rate": 0.4,           # fraction of the indoor/outdoor gap closed per hour
+    "internal_gain": 0.8,       # degC/h from people and equipment at full occupancy
+    "solar_gain": 0.6,          # degC/h at midday for a sunny room
+    "ac_power": 3.0,            # degC/h of cooling while the AC runs
+    "ac_setpoint": 22.0,        # AC switches itself off below this
+    "moisture_gain": 0.25,      # g/kg per hour at full occupancy
+    "dehumidify": 0.4,          # g/kg per hour while the AC runs
+    "air_change": 0.5,          # indoor/outdoor moisture exchange per hour
+    "initial_temp": 21.0,
+}
+
+DEFAULT_SCENARIO = {
+    "name": "default",
+    "start": "2024-07-01T00:00:00",
+    "step_seconds": 10,
+    "seed": 0,
+    "weather": {"mean_temp": 24.0, "daily_amplitude": 6.0, "peak_hour": 15, "humidity": 60.0,
+                "noise": 0.3},
+    "sensor": {"bias": 0.3, "noise": 0.1},
+    "dropout": {"mtbf_hours": 72, "mean_outage_minutes": 15},
+    "buildings": [],
+}
+
+def saturation_pressure(temp):
+    """Saturation vapour pressure in hPa (Magnus formula)"""
+    return 6.112 * np.exp(17.67 * temp / (temp + 243.5))
+
+def mixing_ratio(temp, relative_humidity, pressure=1013.25):
+    """Moisture content in g/kg for a temperature and relative humidity"""
+    vapour = relative_humidity / 100.0 * saturation_pressure(temp)
+    return 622.0 * vapour / (pressure - vapour)
+
+def relative_humidity(temp, moisture, pressure=1013.25):
+    vapour = moisture * pressure / (622.0 + moisture)
+    return np.clip(100.0 * vapour / saturation_pressure(temp), 0.0, 100.0)
+
+def load_scenario(path):
+    """Read a scenario JSON file; missing keys fall back to DEFAULT_SCENARIO"""
+    if not os.path.exists(path) and os.path.exists(os.path.join(SCENARIO_DIR, path)):
+        path = os.path.join(SCENARIO_DIR, path)
+    with open(path) as f:
+        scenario = json.load(f)
+    return {**DEFAULT_SCENARIO, **scenario}
+
+def synthetic_scenario(devices, seed=0):
+    """Office campus sized to roughly `devices` sensors, for capacity tests"""
+    per_building = 10 * 50 * 2
+    count = max(1, math.ceil(devices / per_building))
+    rng = np.random.default_rng(seed)
+    buildings = []
+    for i in range(count):
+        buildings.append({
+            "name": f"b{i:03d}",
+            "floors": 10,
+            "rooms_per_floor": 50,
+            "schedule": "home" if i % 4 == 3 else "office",
+            "leak_rate": round(float(rng.uniform(0.25, 0.6)), 3),
+            "ac_power": round(float(rng.uniform(2.0, 4.0)), 2),
+        })
+    return {**DEFAULT_SCENARIO, "name": f"synthetic-{devices}", "seed": seed,
+            "buildings": buildings}
+
+class ScenarioEngine:
+    """Room state and sensor readings for a whole scenario, one numpy array per quantity"""
+
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.rng = np.random.default_rng(scenario.get("seed", 0))
+        self.step_seconds = float(scenario["step_seconds"])
+        self.time = datetime.fromisoformat(scenario["start"])
+        self.weather = {**DEFAULT_SCENARIO["weather"], **scenario.get("weather", {})}
+        self._commands = []
+        self._commands_lock = threading.Lock()
+        self.stats = {"steps": 0, "commands": 0, "unknown_locations": 0, "ac_auto_off": 0}
+        self._build(scenario["buildings"])
+
+    def _build(self, buildings):
+        rooms, devices = [], []
+        params = {key: [] for key in DEFAULT_BUILDING if isinstance(DEFAULT_BUILDING[key], float)}
+        room_building, room_schedule = [], []
+        schedule_names = list(SCHEDULES)
+        for b, spec in enumerate(buildings):
+            spec = {**DEFAULT_BUILDING, **spec}
+            per_room = spec["devices_per_room"]
+            for floor in range(spec["floors"]):
+                for r in range(spec["rooms_per_floor"]):
+                    location = f"{spec['name']}-f{floor}-r{r:02d}"
+                    room = len(rooms)
+                    rooms.append(location)
+                    room_building.append(b)
+                    room_schedule.append(schedule_names.index(spec["schedule"]))
+                    for key in params:
+                        params[key].append(spec[key])
+                    for device_type in SENSOR_TYPES:
+                        for n in range(per_room.get(device_type, 0)):
+                            devices.append((f"{location}-{device_type[:4]}{n}", device_type, room))
+
+        self.locations = rooms
+        self.room_index = {location: i for i, location in enumerate(rooms)}
+        self.room_building = np.array(room_building, dtype=np.int32)
+        self.room_schedule = np.array(room_schedule, dtype=np.int32)
+        for key, values in params.items():
+            setattr(self, key, np.array(values, dtype=np.float64))
+        self.occupancy_table = np.array([[weekday, weekend] for weekday, weekend in
+                                         SCHEDULES.values()])       # schedule, day kind, hour
+        n_rooms = len(rooms)
+        # Window orientation: how much midday sun a room gets
+        self.sun_exposure = self.rng.uniform(0.0, 1.0, n_rooms)
+
+        self.temp = self.initial_temp + self.rng.normal(0.0, 0.5, n_rooms)
+        self.moisture = mixing_ratio(self.temp, np.full(n_rooms, 45.0))
+        self.ac_on = np.zeros(n_rooms, dtype=bool)
+        self.building_noise = np.zeros(len(buildings))
+        self.room_noise = np.zeros(n_rooms)
+
+        self.device_ids = [d[0] for d in devices]
+        self.device_types = np.array([SENSOR_TYPES.index(d[1]) for d in devices], dtype=np.int8)
+        self.device_room = np.array([d[2] for d in devices], dtype=np.int32)
+        sensor = {**DEFAULT_SCENARIO["sensor"], **self.scenario.get("sensor", {})}
+        n_devices = len(devices)
+        # Each sensor keeps a fixed calibration offset; humidity errors are larger
+        scale = np.where(self.device_types == 0, 1.0, 5.0)
+        self.bias = self.rng.normal(0.0, sensor["bias"], n_devices) * scale
+        self.noise = sensor["noise"] * scale
+        self.online = np.ones(n_devices, dtype=bool)
+
+        dropout = {**DEFAULT_SCENARIO["dropout"], **self.scenario.get("dropout", {})}
+        self.fail_probability = self.step_seconds / (dropout["mtbf_hours"] * 3600)
+        self.recover_probability = min(1.0, self.step_seconds /
+                                       (dropout["mean_outage_minutes"] * 60))
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    # Commands
+
+    def command(self, device_type, location, state):
+        """Queue a command; it is applied at the start of the next step"""
+        with self._commands_lock:
+            self._commands.append((device_type, location, state))
+
+    def on_command_message(self, client, userdata, msg):
+        """paho on_message handler for automation/<device_type>/<location>"""
+        try:
+            data = json.loads(msg.payload.decode())
+            parts = msg.topic.split('/')
+            self.command(parts[1], parts[2], data.get("state"))
+        except (ValueError, IndexError, AttributeError) as e:
+            print(f"Error: {e}")
+
+    def on_connect(self, client, userdata, flags, rc):
+        """paho on_connect handler; subscribing here restores commands after a reconnect"""
+        if rc == 0:
+            client.subscribe("automation/ac/+")
+        else:
+            print(f"✗ Failed to connect: {rc}")
+
+    def _apply_commands(self):
+        with self._commands_lock:
+            commands, self._commands = self._commands, []
+        for device_type, location, state in commands:
+            room = self.room_index.get(location)
+            if room is None:
+                self.stats["unknown_locations"] += 1
+                continue
+            if device_type == "ac":
+                self.ac_on[room] = state in ("on", True, 1)
+                self.stats["commands"] += 1
+
+    # Physics
+
+    def outdoor(self):
+        """Outdoor temperature and moisture per building for the current time"""
+        hour = self.time.hour + self.time.minute / 60.0
+        w = self.weather
+        dt_hours = self.step_seconds / 3600
+        # Slow AR(1) weather noise shared by every room in a building
+        keep = math.exp(-dt_hours / 2.0)
+        self.building_noise = (keep * self.building_noise + math.sqrt(1 - keep * keep) *
+                               self.rng.normal(0.0, w["noise"] * 3, self.building_noise.shape))
+        temp = (w["mean_temp"] + w["daily_amplitude"] *
+                math.cos(2 * math.pi * (hour - w["peak_hour"]) / 24) + self.building_noise)
+        return temp, mixing_ratio(temp, w["humidity"])
+
+    def step(self):
+        """Advance one step; returns (time, readings per device, online mask)"""
+        self._apply_commands()
+        dt = self.step_seconds / 3600
+        hour = self.time.hour + self.time.minute / 60.0
+        weekend = 1 if self.time.weekday() >= 5 else 0
+        occupancy = self.occupancy_table[self.room_schedule, weekend, self.time.hour]
+        sun = max(0.0, math.sin(math.pi * (hour - 6) / 12))
+
+        out_temp, out_moisture = self.outdoor()
+        out_temp = out_temp[self.room_building]
+        out_moisture = out_moisture[self.room_building]
+
+        keep = math.exp(-dt / 0.5)
+        self.room_noise = (keep * self.room_noise + math.sqrt(1 - keep * keep) *
+                           self.rng.normal(0.0, self.weather["noise"], self.room_noise.shape))
+        cooling = np.where(self.ac_on, self.ac_power, 0.0)
+        self.temp += dt * (self.leak_rate * (out_temp - self.temp) +
+                           self.internal_gain * occupancy +
+                           self.solar_gain * self.sun_exposure * sun - cooling)
+        drying = np.where(self.ac_on, self.dehumidify, 0.0)
+        self.moisture += dt * (self.air_change * (out_moisture - self.moisture) +
+                               self.moisture_gain * occupancy - drying)
+        np.maximum(self.moisture, 0.5, out=self.moisture)
+
+        # Thermostat: a running AC cuts out once the room is below its setpoint
+        satisfied = self.ac_on & (self.temp < self.ac_setpoint)
+        self.stats["ac_auto_off"] += int(satisfied.sum())
+        self.ac_on &= ~satisfied
+
+        temp = self.temp + self.room_noise
+        humidity = relative_humidity(temp, self.moisture)
+        room_values = np.stack((temp, humidity))
+        readings = room_values[self.device_types, self.device_room]
+        readings += self.bias + self.rng.normal(0.0, 1.0, len(readings)) * self.noise
+
+        failing = self.rng.random(len(self.online)) < self.fail_probability
+        recovering = self.rng.random(len(self.online)) < self.recover_probability
+        self.online = np.where(self.online, ~failing, recovering)
+
+        self.time += timedelta(seconds=self.step_seconds)
+        self.stats["steps"] += 1
+        return self.time, readings, self.online
+
+class MQTTSink:
+    """Publishes online readings as sensors/<type>/<device_id> messages"""
+
+    def __init__(self, engine, client):
+        self.engine = engine
+        self.client = client
+        self.topics = [f"sensors/{SENSOR_TYPES[t]}/{device_id}"
+                       for t, device_id in zip(engine.device_types, engine.device_ids)]
+        self.published = 0
+
+    def write(self, timestamp, readings, online):
+        engine = self.engine
+        stamp = timestamp.isoformat()
+        values = np.round(readings, 2).tolist()
+        for i in np.flatnonzero(online).tolist():
+            device_type = SENSOR_TYPES[engine.device_types[i]]
+            payload = json.dumps({
+                'value': values[i],
+                'unit': UNITS[device_type],
+                'location': engine.locations[engine.device_room[i]],
+                'timestamp': stamp,
+            })
+            self.client.publish(self.topics[i], payload)
+        self.published += int(online.sum())
+
+    def close(self):
+        pass
+
+class DBSink:
+    """Buffers steps and writes one column per device every `batch_steps` steps"""
+
+    def __init__(self, engine, client, bucket, org, batch_steps=60):
+        self.engine = engine
+        self.client = client
+        self.write_api = sync_write_api(client)
+        self.bucket = bucket
+        self.org = org
+        self.batch_steps = batch_steps
+        self.times = []
+        self.rows = []
+        self.masks = []
+        self.points = 0
+
+    def write(self, timestamp, readings, online):
+        # Scenario times are UTC
+        self.times.append(int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1e9))
+        self.rows.append(readings.copy())
+        self.masks.append(online.copy())
+        if len(self.times) >= self.batch_steps:
+            self.flush()
+
+    def flush(self):
+        if not self.times:
+            return
+        engine = self.engine
+        times = np.array(self.times, dtype=np.int64)
+        values = np.vstack(self.rows)
+        masks = np.vstack(self.masks)
+        columnar = hasattr(self.client, "write_columns")
+        lines = []
+        for i, device_id in enumerate(engine.device_ids):
+            mask = masks[:, i]
+            if not mask.any():
+                continue
+            device_type = SENSOR_TYPES[engine.device_types[i]]
+            tags = {"device_id": device_id, "device_type": device_type,
+                    "location": engine.locations[engine.device_room[i]]}
+            if columnar:
+                self.client.write_columns(device_type, tags, "value", times[mask], values[mask, i])
+            else:
+                tag_text = ",".join(f"{k}={v}" for k, v in sorted(tags.items()))
+                lines.extend(f"{device_type},{tag_text} value={v:.2f} {t}"
+                             for t, v in zip(times[mask].tolist(), values[mask, i].tolist()))
+            self.points += int(mask.sum())
+        if lines:
+            self.write_api.write(bucket=self.bucket, org=self.org, record=lines)
+        self.times, self.rows, self.masks = [], [], []
+
+    def close(self):
+        self.flush()
+        self.client.close()
+
+def run(engine, steps, sinks=(), speed=0.0, report_every=None):
+    """Run `steps` steps; speed is simulated seconds per wall second (0 = flat out)"""
+    start = time.perf_counter()
+    for n in range(1, steps + 1):
+        timestamp, readings, online = engine.step()
+        for sink in sinks:
+            sink.write(timestamp, readings, online)
+        if speed:
+            lag = n * engine.step_seconds / speed - (time.perf_counter() - start)
+            if lag > 0:
+                time.sleep(lag)
+        if report_every and n % report_every == 0:
+            print(f"[{timestamp:%Y-%m-%d %H:%M}] mean temp {engine.temp.mean():.2f}°C, "
+                  f"AC on in {int(engine.ac_on.sum())} rooms, "
+                  f"{int((~online).sum())} sensors offline")
+    for sink in sinks:
+        sink.close()
+    return time.perf_counter() - start
+
+def parse_duration(text):
+    """'90s', '15m', '6h' or '2d' to seconds"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scenario-driven building simulator")
+    parser.add_argument("scenario", nargs="?", help="scenario JSON file (see scenarios/)")
+    parser.add_argument("--devices", type=int, help="synthetic campus with about this many sensors")
+    parser.add_argument("--duration", default="1d", help="simulated time, e.g. 6h or 2d")
+    parser.add_argument("--step", type=float, help="override step_seconds")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="simulated seconds per wall second (0 = as fast as possible)")
+    parser.add_argument("--mqtt", action="store_true",
+                        help="publish readings and follow automation/ac/+ commands")
+    parser.add_argument("--db", action="store_true", help="write readings to InfluxDB")
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.devices:
+        scenario = synthetic_scenario(args.devices, args.seed or 0)
+    else:
+        scenario = load_scenario(args.scenario or "office_campus.json")
+    if args.step:
+        scenario["step_seconds"] = args.step
+    if args.seed is not None:
+        scenario["seed"] = args.seed
+
+    build_start = time.perf_counter()
+    engine = ScenarioEngine(scenario)
+    steps = int(parse_duration(args.duration) / engine.step_seconds)
+    print(f"Scenario {scenario['name']}: {len(engine.locations)} rooms, {len(engine)} sensors, "
+          f"{steps} steps of {engine.step_seconds:.0f}s "
+          f"(built in {time.perf_counter() - build_start:.2f}s)")
+
+    config = get_config()
+    sinks, client = [], None
+    if args.mqtt:
+        client = mqtt_client()
+        client.on_connect = engine.on_connect
+        client.on_message = engine.on_command_message
+        client.connect(config.mqtt_broker, config.mqtt_port, 60)
+        client.loop_start()
+        sinks.append(MQTTSink(engine, client))
+    if args.db:
+        sinks.append(DBSink(engine, influx_client(), config.influxdb_bucket, config.influxdb_org))
+
+    report_every = max(1, int(3600 / engine.step_seconds))
+    elapsed = run(engine, steps, sinks, args.speed, report_every)
+    simulated = steps * engine.step_seconds
+    readings = steps * len(engine)
+    print(f"\nSimulated {simulated / 3600:.1f}h in {elapsed:.2f}s "
+          f"({simulated / elapsed:,.0f}x real time, {readings / elapsed:,.0f} readings/s)")
+    print(f"Stats: {engine.stats}")
+    for sink in sinks:
+        if isinstance(sink, MQTTSink):
+            print(f"Published {sink.published} MQTT messages")
+        else:
+            print(f"Wrote {sink.points} points")
+    if client:
+        client.loop_stop()
+        client.disconnect()
+
+if __name__ == '__main__':
+    main()
@@ -6,16 +6,18 @@ import random
 from datetime import datetime
 
 class SmartSwitch:
-    def __init__(self, device_id, location):
+    def __init__(self, device_id, location, device_type="switch", toggle_probability=0.1):
         self.device_id = device_id
         self.location = location
-        self.device_type = "switch"
+        self.device_type = device_type
         self.state = False  # On/Off state
+        # Chance per read of a manual toggle; use 0 for actuators driven only by commands
+        self.toggle_probability = toggle_probability
         
     def read(self):
         """Read switch state"""
         # Randomly toggle state occasionally
-        if random.random() < 0.1:  # 10% chance to toggle
+        if random.random() < self.toggle_probability:
             self.state = not self.state
         
         return {
@@ -28,3 +30,10 @@ class SmartSwitch:
     def set_state(self, state):
         """Set switch state"""
         self.state = state
+    
+    def apply_command(self, command):
+        """Apply an automation command; returns True if the state changed"""
+        state = command.get('state') in ('on', True, 1)
+        changed = state != self.state
+        self.set_state(state)
+        return changed
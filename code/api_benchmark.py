@@ -0,0 +1,194 @@
+"""
+Compare sync and async API client throughput against a local stand-in API
+"""
+
+import asyncio
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+from api_client import APIClient
+from async_api_client import AsyncAPIClient, gather_with_limit, check_replicas
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal in-memory imitation of the Flask API endpoints"""
+
+    protocol_version = "HTTP/1.1"
+    # Buffer writes so headers and body leave in one segment
+    wbufsize = 64 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200, etag=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body) if body else {}
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self.send_json({"status": "healthy"})
+        elif path == "/devices/list":
+            etag = f'"{self.server.version}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            devices = list(self.server.devices.values())
+            self.send_json({"devices": devices, "count": len(devices)}, etag=etag)
+        elif self.path == "/":
+            self.send_json({"name": "stand-in API"})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        payload = self.read_json()
+        if self.path == "/devices/register":
+            self.server.devices[payload["device_id"]] = payload
+            self.server.version += 1
+            self.send_json({"status": "registered", "device_id": payload["device_id"]})
+        elif self.path == "/database/write":
+            self.server.points.append(payload)
+            self.send_json({"status": "written"})
+        elif self.path == "/database/query":
+            results = self.server.points[-10:]
+            self.send_json({"results": results, "count": len(results)})
+        elif self.path == "/mqtt/publish":
+            self.send_json({"status": "published", "topic": payload.get("topic")})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+class StandInAPI(ThreadingHTTPServer):
+    """Stand-in Flask API served from a background thread"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency=0.005, host="127.0.0.1", port=0):
+        super().__init__((host, port), StandInHandler)
+        self.latency = latency
+        self.devices = {}
+        self.version = 0
+        self.points = []
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def point(i):
+    return {"measurement": "temperature", "fields": {"value": 20 + i % 10},
+            "tags": {"device_id": f"temp-{i:04d}"}}
+
+def bench_sync_sequential(url, n):
+    with APIClient(url) as client:
+        for i in range(n):
+            client.post("/database/write", point(i))
+
+def bench_sync_batch(url, n, concurrency):
+    with APIClient(url, pool_size=concurrency) as client:
+        result = client.post_batch("/database/write", (point(i) for i in range(n)),
+                                   chunk_size=max(1, n // (concurrency * 4)),
+                                   max_workers=concurrency)
+        assert not result["failed"], result["failed"][:3]
+
+async def bench_async(url, n, concurrency):
+    async with AsyncAPIClient(url, pool_size=concurrency) as client:
+        await gather_with_limit(
+            concurrency, *(client.write_to_database(**point(i)) for i in range(n))
+        )
+
+async def check_async_endpoints(server):
+    """Exercise every AsyncAPIClient call against the stand-in; returns failed checks"""
+    failures = []
+
+    def expect(name, ok, detail):
+        print(f"{'✓' if ok else '✗'} async {name}")
+        if not ok:
+            failures.append(f"{name}: {detail}")
+
+    server.points.clear()
+    async with AsyncAPIClient(server.url) as client:
+        result = await client.check_health()
+        expect("check_health", result.get("status") == "healthy", result)
+        result = await client.publish_mqtt("sensors/check", {"value": 1})
+        expect("publish_mqtt", result.get("topic") == "sensors/check", result)
+        result = await client.write_to_database(**point(1))
+        expect("write_to_database", result.get("status") == "written" and len(server.points) == 1,
+               result)
+        result = await client.query_database('from(bucket: "iot-data") |> range(start: -1h)')
+        expect("query_database", result.get("count") == 1 and result["results"][0] == point(1),
+               result)
+        result = await client.register_device("check-001", "temperature", location="lab")
+        expect("register_device", result.get("device_id") == "check-001" and
+               server.devices.get("check-001", {}).get("location") == "lab", result)
+        result = await client.list_devices()
+        expect("list_devices", any(d["device_id"] == "check-001" for d in result.get("devices", [])),
+               result)
+        stats = client.get_stats()
+        expect("get_stats", all(entry["count"] >= 1 for entry in stats.values()) and len(stats) == 6,
+               stats)
+
+    # One live and one unreachable replica: the dead one is reported, not raised
+    healthy, dead = await check_replicas([server.url, "http://127.0.0.1:1"])
+    expect("check_replicas", isinstance(healthy, dict) and healthy.get("status") == "healthy"
+           and isinstance(dead, Exception), (healthy, dead))
+    server.points.clear()
+    return failures
+
+def run(name, server, n, fn):
+    server.points.clear()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    if len(server.points) != n:
+        raise SystemExit(f"{name}: server received {len(server.points)} of {n} points")
+    print(f"{name:<28} {n / elapsed:>10.0f} req/s  ({elapsed:.2f}s)")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    server = StandInAPI().start()
+    print(f"Stand-in API at {server.url}, {server.latency * 1000:.0f}ms per request")
+    print(f"{n} writes, concurrency {concurrency}")
+    print("-" * 60)
+    try:
+        failures = asyncio.run(check_async_endpoints(server))
+        if failures:
+            raise SystemExit("Async client checks failed:\n  " + "\n  ".join(failures))
+        print("-" * 60)
+        run("sync client, sequential", server, n, lambda: bench_sync_sequential(server.url, n))
+        run("sync client, post_batch", server, n, lambda: bench_sync_batch(server.url, n, concurrency))
+        run("async client", server, n, lambda: asyncio.run(bench_async(server.url, n, concurrency)))
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -3,21 +3,175 @@ API Client client for interacting with Flask API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
 import json
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+import time
+from iot_core import get_config
+from iot_core.api_common import RETRY_STATUS, APIClientBase
 
 # API Configuration
-API_BASE_URL = os.getenv("FLASK_API_URL", "http://localhost:5000")
+API_BASE_URL = get_config().flask_api_url
+
+class APIClient(APIClientBase):
+    """Flask API client sharing one keep-alive connection pool"""
+
+    def __init__(self, base_url=API_BASE_URL, timeout=(3.05, 10),
+                 retries=3, backoff=0.5, pool_size=10, compress=False,
+                 compress_min_bytes=1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.pool_size = pool_size
+
+        # One session = one pool of persistent connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip"})
+
+        self._init_stats()
+
+    def send(self, method, endpoint, payload=None, idempotent=None, params=None, headers=None):
+        """Send a request with retries and return the raw response"""
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD", "PUT", "DELETE")
+        attempts = self.retries + 1 if idempotent else 1
+
+        body = None
+        headers = dict(headers or {})
+        if payload is not None:
+            body, body_headers = self._encode(payload)
+            headers.update(body_headers)
+
+        url = f"{self.base_url}{endpoint}"
+        for attempt in range(attempts):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method, url, data=body, headers=headers, params=params,
+                    timeout=self.timeout
+                )
+                if response.status_code in RETRY_STATUS and attempt < attempts - 1:
+                    self._record(endpoint, time.perf_counter() - start, False)
+                    time.sleep(self.backoff * (2 ** attempt))
+                    continue
+                response.raise_for_status()
+                self._record(endpoint, time.perf_counter() - start, True)
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._record(endpoint, time.perf_counter() - start, False)
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(self.backoff * (2 ** attempt))
+            except requests.exceptions.RequestException:
+                self._record(endpoint, time.perf_counter() - start, False)
+                raise
+
+    def request(self, method, endpoint, payload=None, idempotent=None):
+        """Send a request and return the decoded JSON response"""
+        return self.send(method, endpoint, payload, idempotent).json()
+
+    def get(self, endpoint):
+        return self.request("GET", endpoint)
+
+    def get_conditional(self, endpoint, etag=None, params=None):
+        """GET with If-None-Match; returns (data or None when unchanged, etag)"""
+        headers = {"If-None-Match": etag} if etag else None
+        response = self.send("GET", endpoint, params=params, headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.json(), response.headers.get("ETag")
+
+    def post(self, endpoint, payload, idempotent=False):
+        return self.request("POST", endpoint, payload, idempotent=idempotent)
+
+    def _send_chunk(self, endpoint, chunk):
+        """Send one chunk item by item, collecting per-item failures"""
+        sent, failed = 0, []
+        for index, payload in chunk:
+            try:
+                self.post(endpoint, payload)
+                sent += 1
+            except requests.exceptions.RequestException as e:
+                failed.append({"index": index, "item": payload, "error": str(e)})
+        return sent, failed
+
+    @staticmethod
+    def _prepare_chunk(raw, prepare, failed):
+        """Build request bodies; items prepare() rejects are reported, not raised"""
+        if prepare is None:
+            return raw
+        chunk = []
+        for index, item in raw:
+            try:
+                chunk.append((index, prepare(item)))
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                failed.append({"index": index, "item": item, "error": f"invalid item: {e!r}"})
+        return chunk
+
+    def post_batch(self, endpoint, payloads, chunk_size=100, max_workers=4, prepare=None):
+        """POST many payloads in chunks, with at most max_workers chunks in flight
+
+        prepare(item), when given, turns each input item into its request body.
+        An item it fails on is recorded in failed with its index, and the
+        rest of the batch still goes out. max_workers is capped at pool_size
+        so every worker keeps its own keep-alive connection.
+        """
+        # More workers than pooled connections makes urllib3 discard and reopen them
+        max_workers = max(1, min(max_workers, self.pool_size))
+        items = enumerate(payloads)
+        result = {"sent": 0, "failed": []}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            exhausted = False
+            while True:
+                # Pull the iterable lazily so huge inputs never sit in memory
+                while len(pending) < max_workers and not exhausted:
+                    raw = list(islice(items, chunk_size))
+                    if not raw:
+                        exhausted = True
+                        break
+                    chunk = self._prepare_chunk(raw, prepare, result["failed"])
+                    if chunk:
+                        pending.add(executor.submit(self._send_chunk, endpoint, chunk))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    sent, failed = future.result()
+                    result["sent"] += sent
+                    result["failed"].extend(failed)
+        result["failed"].sort(key=lambda f: f["index"])
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_default_client = None
+
+def get_client():
+    """Return the shared module-level client"""
+    global _default_client
+    if _default_client is None:
+        _default_client = APIClient()
+    return _default_client
 
 def get_api_info():
     """Get API information"""
     try:
-        response = requests.get(f"{API_BASE_URL}/")
-        response.raise_for_status()
-        return response.json()
+        return get_client().get("/")
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
@@ -25,9 +179,7 @@ def get_api_info():
 def check_health():
     """Check API health"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
-        response.raise_for_status()
-        return response.json()
+        return get_client().get("/health")
     except requests.exceptions.RequestException as e:
         return {"error": str(e)}
 
@@ -41,9 +193,9 @@ def main():
     else:
         print(" API Information:")
         print(json.dumps(info, indent=2))
-    
+
     print()
-    
+
     # Test health
     health = check_health()
     if "error" in health:
@@ -52,5 +204,12 @@ def main():
         print(" Health Status:")
         print(json.dumps(health, indent=2))
 
+    print()
+
+    # Latency per endpoint
+    print(" Request latency:")
+    for endpoint, stats in get_client().get_stats().items():
+        print(f"  {endpoint}: {stats}")
+
 if __name__ == "__main__":
     main()
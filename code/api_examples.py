@@ -2,61 +2,87 @@
 Examples of using Flask API endpoints
 """
 
-import requests
 import json
+import requests
 from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from api_client import get_client
 
-API_BASE_URL = os.getenv("FLASK_API_URL", "http://localhost:5000")
+def _call(method, endpoint, payload=None, idempotent=None):
+    """Return the API's JSON body, including its error body on 4xx/5xx"""
+    try:
+        return get_client().request(method, endpoint, payload, idempotent)
+    except requests.exceptions.HTTPError as e:
+        try:
+            return e.response.json()
+        except ValueError:
+            return {"error": str(e)}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
 
 def publish_mqtt(topic, message):
     """Publish message via MQTT API"""
-    url = f"{API_BASE_URL}/mqtt/publish"
     payload = {
         "topic": topic,
         "message": message,
         "qos": 1
     }
-    response = requests.post(url, json=payload)
-    return response.json()
+    return _call("POST", "/mqtt/publish", payload)
 
 def write_to_database(measurement, fields, tags=None):
     """Write to InfluxDB via API"""
-    url = f"{API_BASE_URL}/database/write"
     payload = {
         "measurement": measurement,
         "fields": fields,
         "tags": tags or {}
     }
-    response = requests.post(url, json=payload)
-    return response.json()
+    return _call("POST", "/database/write", payload)
 
 def query_database(flux_query):
     """Query InfluxDB via API"""
-    url = f"{API_BASE_URL}/database/query"
     payload = {"query": flux_query}
-    response = requests.post(url, json=payload)
-    return response.json()
+    return _call("POST", "/database/query", payload, idempotent=True)
 
-def register_device(device_id, device_type, device_name=None):
+def register_device(device_id, device_type, device_name=None, location=None):
     """Register device via API"""
-    url = f"{API_BASE_URL}/devices/register"
     payload = {
         "device_id": device_id,
         "device_type": device_type,
         "device_name": device_name or device_id
     }
-    response = requests.post(url, json=payload)
-    return response.json()
+    if location:
+        payload["location"] = location
+    return _call("POST", "/devices/register", payload)
+
+def _point_payload(point):
+    return {
+        "measurement": point["measurement"],
+        "fields": point["fields"],
+        "tags": point.get("tags") or {}
+    }
+
+def _device_payload(device):
+    payload = {
+        "device_id": device["device_id"],
+        "device_type": device["device_type"],
+        "device_name": device.get("device_name") or device["device_id"]
+    }
+    if device.get("location"):
+        payload["location"] = device["location"]
+    return payload
+
+def write_points_to_database(points, chunk_size=100, max_workers=4):
+    """Write many points via API; each point is a dict with measurement, fields, tags"""
+    return get_client().post_batch("/database/write", points, chunk_size, max_workers,
+                                   prepare=_point_payload)
+
+def register_devices(devices, chunk_size=100, max_workers=4):
+    """Register many devices via API; each device is a dict with device_id, device_type, location"""
+    return get_client().post_batch("/devices/register", devices, chunk_size, max_workers,
+                                   prepare=_device_payload)
 
 def list_devices():
     """List all devices"""
-    url = f"{API_BASE_URL}/devices/list"
-    response = requests.get(url)
-    return response.json()
+    return _call("GET", "/devices/list")
 
 def main():
     # Publish MQTT message
@@ -99,8 +125,15 @@ def main():
     
     # Device management
     print("Registering devices")
-    register_device("temp-001", "temperature", "Living Room Sensor")
-    register_device("hum-001", "humidity", "Living Room Humidity")
+    register_device("temp-001", "temperature", "Living Room Sensor", "living_room")
+    register_device("hum-001", "humidity", "Living Room Humidity", "living_room")
+
+    # Bulk registration reports failures per device
+    result = register_devices(
+        {"device_id": f"temp-{i:03d}", "device_type": "temperature", "location": f"room-{i % 10}"}
+        for i in range(2, 50)
+    )
+    print(f"Bulk registered {result['sent']} devices, {len(result['failed'])} failed")
     
     devices = list_devices()
     print(f"Registered devices: {devices.get('count', 0)}")
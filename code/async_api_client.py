@@ -0,0 +1,155 @@
+"""
+Asyncio client for the Flask API, for concurrent fan-out
+"""
+
+import aiohttp
+import asyncio
+import time
+from iot_core import get_config
+from iot_core.api_common import RETRY_STATUS, APIClientBase
+
+API_BASE_URL = get_config().flask_api_url
+
+async def gather_with_limit(limit, *coros, return_exceptions=False):
+    """Run coroutines concurrently with at most `limit` running at once"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=return_exceptions)
+
+class AsyncAPIClient(APIClientBase):
+    """Async Flask API client sharing one aiohttp connection pool"""
+
+    def __init__(self, base_url=API_BASE_URL, timeout=10, retries=3, backoff=0.5,
+                 pool_size=100, compress=False, compress_min_bytes=1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.session = None
+        self._init_stats()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def request(self, method, endpoint, payload=None, idempotent=None):
+        """Send a request and return the decoded JSON response"""
+        await self.open()
+        if idempotent is None:
+            idempotent = method in ("GET", "HEAD", "PUT", "DELETE")
+        attempts = self.retries + 1 if idempotent else 1
+
+        body, headers = (None, None)
+        if payload is not None:
+            body, headers = self._encode(payload)
+
+        url = f"{self.base_url}{endpoint}"
+        for attempt in range(attempts):
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, data=body, headers=headers) as response:
+                    if response.status in RETRY_STATUS and attempt < attempts - 1:
+                        self._record(endpoint, time.perf_counter() - start, False)
+                        await asyncio.sleep(self.backoff * (2 ** attempt))
+                        continue
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                self._record(endpoint, time.perf_counter() - start, True)
+                return data
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                self._record(endpoint, time.perf_counter() - start, False)
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+            except aiohttp.ClientError:
+                self._record(endpoint, time.perf_counter() - start, False)
+                raise
+
+    async def get(self, endpoint):
+        return await self.request("GET", endpoint)
+
+    async def post(self, endpoint, payload, idempotent=False):
+        return await self.request("POST", endpoint, payload, idempotent=idempotent)
+
+    async def check_health(self):
+        return await self.get("/health")
+
+    async def publish_mqtt(self, topic, message, qos=1):
+        payload = {"topic": topic, "message": message, "qos": qos}
+        return await self.post("/mqtt/publish", payload)
+
+    async def write_to_database(self, measurement, fields, tags=None):
+        payload = {"measurement": measurement, "fields": fields, "tags": tags or {}}
+        return await self.post("/database/write", payload)
+
+    async def query_database(self, flux_query):
+        return await self.post("/database/query", {"query": flux_query}, idempotent=True)
+
+    async def register_device(self, device_id, device_type, device_name=None, location=None):
+        payload = {
+            "device_id": device_id,
+            "device_type": device_type,
+            "device_name": device_name or device_id
+        }
+        if location:
+            payload["location"] = location
+        return await self.post("/devices/register", payload)
+
+    async def list_devices(self):
+        return await self.get("/devices/list")
+
+async def check_replicas(urls):
+    """Check /health on several API replicas concurrently"""
+    clients = [AsyncAPIClient(url, retries=0) for url in urls]
+    try:
+        return await gather_with_limit(
+            10, *(c.check_health() for c in clients), return_exceptions=True
+        )
+    finally:
+        await asyncio.gather(*(c.close() for c in clients))
+
+async def main():
+    replicas = get_config().flask_api_replicas
+    for url, result in zip(replicas, await check_replicas(replicas)):
+        print(f"{url}: {result}")
+
+    async with AsyncAPIClient() as client:
+        # Query the latest value of 50 devices concurrently
+        queries = [
+            f'''
+            from(bucket: "iot-data")
+              |> range(start: -1h)
+              |> filter(fn: (r) => r["device_id"] == "temp-{i:03d}")
+              |> last()
+            '''
+            for i in range(50)
+        ]
+        results = await gather_with_limit(
+            20, *(client.query_database(q) for q in queries), return_exceptions=True
+        )
+        errors = sum(1 for r in results if isinstance(r, Exception))
+        print(f"Ran {len(results)} queries, {errors} failed")
+        print(client.get_stats())
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,20 +2,25 @@
 Monitor Automation Dashboard OOP
 """
 
-import paho.mqtt.client as mqtt
 import json
+from collections import deque
 from datetime import datetime
+from iot_core import get_config, get_instrumentation, mqtt_client
 
 class AutomationDashboard:
-    def __init__(self):
-        self.automation_events = []
+    def __init__(self, max_events=1000):
+        # Most recent events only; a plain list grew without bound on long runs
+        self.automation_events = deque(maxlen=max_events)
+        self.metrics = get_instrumentation("automation_dashboard")
+        self.metrics.gauge("automation_events", lambda: len(self.automation_events))
         self.setup_mqtt()
     
     def setup_mqtt(self):
-        self.mqtt_client = mqtt.Client()
+        self.mqtt_client = mqtt_client()
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
-        self.mqtt_client.connect("localhost", 1883, 60)
+        config = get_config()
+        self.mqtt_client.connect(config.mqtt_broker, config.mqtt_port, 60)
         self.mqtt_client.loop_start()
     
     def on_connect(self, client, userdata, flags, rc):
@@ -24,6 +29,11 @@ class AutomationDashboard:
             print("✓ Automation dashboard connected!")
     
     def on_message(self, client, userdata, msg):
+        self.metrics.incr("messages_in")
+        with self.metrics.timer("handler"):
+            self.handle_message(msg)
+    
+    def handle_message(self, msg):
         try:
             data = json.loads(msg.payload.decode())
             event = {
@@ -35,6 +45,7 @@ class AutomationDashboard:
             self.automation_events.append(event)
             print(f"Event: {event}")
         except Exception as e:
+            self.metrics.incr("errors")
             print(f"Error: {e}")
     
     def run(self):
@@ -45,8 +56,11 @@ class AutomationDashboard:
                 time.sleep(1)
         except KeyboardInterrupt:
             print("\nStopping...")
-            self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
+            self.stop()
+    
+    def stop(self):
+        self.mqtt_client.loop_stop()
+        self.mqtt_client.disconnect()
 
 if __name__ == "__main__":
     dashboard = AutomationDashboard()
@@ -0,0 +1,109 @@
+"""
+Coalesce and rate-limit sensor updates before they reach dashboard/... topics
+"""
+
+import json
+import threading
+import time
+from persistent_publisher import get_publisher
+
+class DashboardAggregator:
+    """Keeps the latest value per widget and publishes at most max_rate updates/s each"""
+
+    def __init__(self, publisher=None, max_rate=2.0, thresholds=None, default_threshold=0.0,
+                 batch_topic=None, topic_prefix="dashboard", tick=0.05):
+        self.publisher = publisher or get_publisher()
+        self.min_interval = 1.0 / max_rate
+        self.thresholds = thresholds or {}
+        self.default_threshold = default_threshold
+        # When set, widgets due in the same tick go out as one message here
+        self.batch_topic = batch_topic
+        self.topic_prefix = topic_prefix
+        self.tick = tick
+
+        self._lock = threading.Lock()
+        self._latest = {}     # widget -> newest value
+        self._sent = {}       # widget -> (value, sent_at)
+        self.stats = {"updates": 0, "published": 0, "messages": 0}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def update(self, widget, value):
+        """Record a new value; only the latest per widget is kept"""
+        with self._lock:
+            self._latest[widget] = value
+            self.stats["updates"] += 1
+
+    def on_sensor_message(self, client, userdata, msg):
+        """paho on_message handler for sensors/<type>/<device_id> topics"""
+        try:
+            data = json.loads(msg.payload.decode())
+            widget = msg.topic.split('/')[1]
+            self.update(widget, data.get('value'))
+        except (ValueError, IndexError, AttributeError) as e:
+            print(f"Error: {e}")
+
+    def _changed(self, widget, value):
+        if widget not in self._sent:
+            return True
+        previous = self._sent[widget][0]
+        if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+            return value != previous
+        return abs(value - previous) > self.thresholds.get(widget, self.default_threshold)
+
+    def _collect_due(self, now, force=False):
+        """Pick widgets whose value changed enough and whose rate limit has elapsed"""
+        due = {}
+        with self._lock:
+            for widget, value in self._latest.items():
+                if not self._changed(widget, value):
+                    continue
+                sent = self._sent.get(widget)
+                if force or sent is None or now - sent[1] >= self.min_interval:
+                    due[widget] = value
+                    self._sent[widget] = (value, now)
+        return due
+
+    def flush_due(self, now=None, force=False):
+        """Publish every due widget; returns the number of widgets sent"""
+        due = self._collect_due(time.monotonic() if now is None else now, force)
+        if not due:
+            return 0
+        if self.batch_topic and len(due) > 1:
+            self.publisher.publish(self.batch_topic, {"widgets": due})
+            self.stats["messages"] += 1
+        else:
+            for widget, value in due.items():
+                self.publisher.publish(f"{self.topic_prefix}/{widget}", {"value": value})
+                self.stats["messages"] += 1
+        self.stats["published"] += len(due)
+        return len(due)
+
+    def _run(self):
+        while not self._stop.wait(self.tick):
+            self.flush_due()
+
+    def close(self):
+        """Stop the ticker and push out the final values regardless of rate"""
+        self._stop.set()
+        self._thread.join()
+        self.flush_due(force=True)
+
+if __name__ == "__main__":
+    from iot_core import get_config, mqtt_client
+
+    config = get_config()
+    aggregator = DashboardAggregator(thresholds={"temperature": 0.1, "humidity": 0.5})
+    client = mqtt_client()
+    client.on_message = aggregator.on_sensor_message
+    client.connect(config.mqtt_broker, config.mqtt_port, 60)
+    client.subscribe("sensors/+/+")
+    print("Forwarding sensors/+/+ to dashboard/... (Press Ctrl+C to stop)")
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        client.disconnect()
+        aggregator.close()
+        print(f"\n{aggregator.stats}")
@@ -0,0 +1,158 @@
+"""
+Client-side device registry cache with incremental sync and O(1) lookups
+"""
+
+import threading
+import time
+from api_client import get_client
+
+class DeviceRegistry:
+    """Mirrors /devices/list locally, indexed by device_id, device_type and location
+
+    Sync is incremental when the API supports it: the ETag from the last
+    full listing is sent as If-None-Match, and a `cursor` returned by the
+    API is sent back as `since` to fetch only changed devices. Responses
+    may be paginated with `next_page` and may list removed ids in
+    `deleted`. Without a cursor the response is treated as a full snapshot.
+    """
+
+    def __init__(self, client=None, endpoint="/devices/list", page_size=500):
+        self.client = client or get_client()
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.devices = {}
+        self._by_type = {}
+        self._by_location = {}
+        self._lock = threading.Lock()
+        self.etag = None
+        self.cursor = None
+        self.last_sync = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _index(self, device):
+        device_id = device["device_id"]
+        old = self.devices.get(device_id)
+        if old is not None:
+            self._unindex(old)
+        self.devices[device_id] = device
+        self._by_type.setdefault(device.get("device_type"), set()).add(device_id)
+        self._by_location.setdefault(device.get("location"), set()).add(device_id)
+
+    def _unindex(self, device):
+        device_id = device["device_id"]
+        for index, key in ((self._by_type, device.get("device_type")),
+                           (self._by_location, device.get("location"))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(device_id)
+                if not ids:
+                    del index[key]
+
+    def _fetch_pages(self):
+        """Yield response pages for one sync; yields nothing when unchanged"""
+        params = {"limit": self.page_size}
+        if self.cursor:
+            params["since"] = self.cursor
+        etag = None if self.cursor else self.etag
+        first_etag = None
+        while True:
+            data, new_etag = self.client.get_conditional(self.endpoint, etag=etag, params=params)
+            if data is None:
+                return
+            if "page" not in params:
+                # Only the first page's ETag validates the listing on the next sync
+                first_etag = new_etag
+            yield data
+            next_page = data.get("next_page")
+            if not next_page:
+                if first_etag and not self.cursor:
+                    # Every page was fetched, so a 304 next time really means unchanged
+                    self.etag = first_etag
+                return
+            params = {**params, "page": next_page}
+            etag = None
+
+    def sync(self):
+        """Pull changes from the API; returns the number of devices added or updated"""
+        incremental = self.cursor is not None
+        changed, seen, cursor, pages = 0, set(), None, 0
+        updates, deleted = [], []
+        for data in self._fetch_pages():
+            pages += 1
+            for device in data.get("devices", []):
+                if device.get("device_id"):
+                    updates.append(device)
+                    seen.add(device["device_id"])
+            deleted.extend(data.get("deleted", []))
+            cursor = data.get("cursor", cursor)
+
+        with self._lock:
+            if pages:
+                for device in updates:
+                    if self.devices.get(device["device_id"]) != device:
+                        self._index(device)
+                        changed += 1
+                if not incremental and cursor is None:
+                    # Full snapshot: anything not listed is gone
+                    deleted.extend(set(self.devices) - seen)
+                for device_id in deleted:
+                    device = self.devices.pop(device_id, None)
+                    if device is not None:
+                        self._unindex(device)
+                self.cursor = cursor or self.cursor
+            self.last_sync = time.time()
+        return changed
+
+    def get(self, device_id, default=None):
+        return self.devices.get(device_id, default)
+
+    def by_type(self, device_type):
+        with self._lock:
+            return [self.devices[i] for i in self._by_type.get(device_type, ())]
+
+    def by_location(self, location):
+        with self._lock:
+            return [self.devices[i] for i in self._by_location.get(location, ())]
+
+    def device_types(self):
+        with self._lock:
+            return list(self._by_type)
+
+    def location_of(self, device_id, default="unknown"):
+        device = self.devices.get(device_id)
+        return device.get("location", default) if device else default
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Device registry sync failed: {e}")
+
+    def start(self, interval=60):
+        """Sync once, then keep syncing in the background"""
+        try:
+            self.sync()
+        except Exception as e:
+            print(f"Device registry sync failed: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+def main():
+    registry = DeviceRegistry()
+    changed = registry.sync()
+    print(f"Synced {len(registry.devices)} devices ({changed} changed)")
+    for device_type in sorted(registry.device_types(), key=str):
+        print(f"  {device_type}: {len(registry.by_type(device_type))} devices")
+    print(f"Second sync changed {registry.sync()} devices")
+
+if __name__ == "__main__":
+    main()
@@ -2,26 +2,31 @@
 Home automation system OOP
 """
 
-import paho.mqtt.client as mqtt
+import itertools
 import json
 from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from iot_core import get_config, get_instrumentation, mqtt_client
 
 class HomeAutomation:
-    def __init__(self):
+    def __init__(self, registry=None):
         self.mqtt_client = None
         self.temperature_threshold = 25.0
+        # Optional DeviceRegistry for resolving device metadata without API calls
+        self.registry = registry
+        self.metrics = get_instrumentation("home_automation")
+        # Sequential ids let actuators detect commands that never reached them
+        self._command_ids = itertools.count(1)
         self.setup_mqtt()
         
     def setup_mqtt(self):
-        self.mqtt_client = mqtt.Client()
+        self.mqtt_client = mqtt_client()
         self.mqtt_client.on_connect = self.on_connect
         self.mqtt_client.on_message = self.on_message
-        self.mqtt_client.connect("localhost", 1883, 60)
+        config = get_config()
+        self.mqtt_client.connect(config.mqtt_broker, config.mqtt_port, 60)
         self.mqtt_client.loop_start()
+        # paho keeps no public queue length; its outgoing packet deque is the closest
+        self.metrics.gauge("mqtt_out_queue", lambda: len(getattr(self.mqtt_client, "_out_packet", ())))
     
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
@@ -32,19 +37,29 @@ class HomeAutomation:
             print(f"✗ Failed to connect: {rc}")
     
     def on_message(self, client, userdata, msg):
+        self.metrics.incr("messages_in")
+        with self.metrics.timer("handler"):
+            self.handle_message(msg)
+    
+    def handle_message(self, msg):
         try:
             data = json.loads(msg.payload.decode())
             topic_parts = msg.topic.split('/')
             sensor_type = topic_parts[1]
             
+            device_id = topic_parts[2] if len(topic_parts) > 2 else None
+            
             if sensor_type == "temperature":
-                self.handle_temperature(data)
+                self.handle_temperature(data, device_id)
         except Exception as e:
+            self.metrics.incr("errors")
             print(f"Error: {e}")
     
-    def handle_temperature(self, data):
+    def handle_temperature(self, data, device_id=None):
         temperature = data.get('value', 0)
-        location = data.get('location', 'unknown')
+        location = data.get('location')
+        if location is None:
+            location = self.registry.location_of(device_id) if self.registry else 'unknown'
         
         if temperature > self.temperature_threshold:
             self.control_device("ac", location, "on", f"Temperature {temperature}°C exceeds threshold")
@@ -55,10 +70,12 @@ class HomeAutomation:
             "location": location,
             "state": state,
             "reason": reason,
+            "command_id": next(self._command_ids),
             "timestamp": datetime.now().isoformat()
         }
         topic = f"automation/{device_type}/{location}"
         self.mqtt_client.publish(topic, json.dumps(command))
+        self.metrics.incr("messages_out")
         print(f"Command: {device_type} at {location} -> {state}")
     
     def run(self):
@@ -69,8 +86,11 @@ class HomeAutomation:
                 time.sleep(1)
         except KeyboardInterrupt:
             print("\nStopping...")
-            self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
+            self.stop()
+    
+    def stop(self):
+        self.mqtt_client.loop_stop()
+        self.mqtt_client.disconnect()
 
 if __name__ == "__main__":
     automation = HomeAutomation()
@@ -0,0 +1,365 @@
+"""
+Bulk backfill historical sensor readings from CSV/JSONL into InfluxDB
+
+Files are streamed in chunks, converted to line protocol in worker
+processes and sent gzip-compressed with a bounded number of in-flight
+requests. A checkpoint file records how far each input has been written
+so an interrupted backfill can be resumed.
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+from iot_core import get_config
+
+# InfluxDB Configuration (memory:// or file:///path selects the local store)
+config = get_config()
+URL = config.influxdb_url
+TOKEN = config.influxdb_token
+ORG = config.influxdb_org
+BUCKET = config.influxdb_bucket
+
+TIME_COLUMNS = ("time", "timestamp", "_time")
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Plain decimal numbers only: float() would also take "nan", "1_000" and "0012"
+NUMBER = re.compile(r"-?(0|[1-9][0-9]*)(\.[0-9]+)?([eE][-+]?[0-9]+)?")
+
+class ChunkRejected(Exception):
+    """The database refused a chunk outright; resending it will not help"""
+
+def _escape_key(text):
+    return str(text).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+def _escape_measurement(text):
+    return str(text).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+def _int_value(value):
+    """Integer field for columns named in --int-fields; anything else is a row error"""
+    if isinstance(value, bool):
+        raise ValueError(f"boolean {value!r} in an integer field")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) or re.fullmatch(r"-?(0|[1-9][0-9]*)", str(value)):
+        return f"{value}i"
+    raise ValueError(f"{value!r} is not an integer")
+
+def _field_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        # Floats like the CSV path, so 21 and 21.5 in one field do not conflict
+        try:
+            value = float(value)
+        except OverflowError:
+            raise ValueError(f"field value {value} out of range") from None
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"non-finite field value {value!r}")
+        return repr(value)
+    text = str(value)
+    if NUMBER.fullmatch(text):
+        number = float(text)
+        if not math.isfinite(number):
+            raise ValueError(f"field value {text!r} out of range")
+        return repr(number)
+    if text.strip().lower().lstrip("+-") in ("nan", "inf", "infinity"):
+        raise ValueError(f"non-finite field value {text!r}")
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+def _time_ns(value):
+    """Parse ISO 8601 or epoch seconds/ms/us/ns (guessed from magnitude)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or str(value).lstrip("-").replace(".", "", 1).isdigit():
+        number = float(value)
+        magnitude = abs(number)
+        if magnitude < 1e11:
+            return int(number * 1e9)
+        if magnitude < 1e14:
+            return int(number * 1e6)
+        if magnitude < 1e17:
+            return int(number * 1e3)
+        return int(number)
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) * 10**9 + parsed.microsecond * 1000
+
+def to_line(row, measurement, tag_keys, int_fields=()):
+    """Build one line of line protocol from a flat or measurement/tags/fields row"""
+    if "fields" in row:
+        measurement = row.get("measurement", measurement)
+        tags = row.get("tags", {})
+        fields = row["fields"]
+        timestamp = row.get("time")
+    else:
+        row = dict(row)
+        measurement = row.pop("measurement", None) or measurement
+        timestamp = next((row.pop(c) for c in TIME_COLUMNS if c in row), None)
+        tags = {k: row.pop(k) for k in tag_keys if row.get(k) not in (None, "")}
+        fields = {k: v for k, v in row.items() if v not in (None, "")}
+    if not fields:
+        raise ValueError("row has no fields")
+
+    line = _escape_measurement(measurement)
+    for key in sorted(tags):
+        line += f",{_escape_key(key)}={_escape_key(tags[key])}"
+    line += " " + ",".join(f"{_escape_key(k)}={_int_value(v) if k in int_fields else _field_value(v)}"
+                           for k, v in fields.items())
+    ns = _time_ns(timestamp)
+    if ns is not None:
+        line += f" {ns}"
+    return line
+
+def convert_chunk(lines, fmt, header, measurement, tag_keys, compress, int_fields=()):
+    """Worker: turn raw CSV/JSONL lines into (points, errors, payload bytes)"""
+    if fmt == "csv":
+        rows = csv.DictReader(io.StringIO("".join(lines)), fieldnames=header)
+    else:
+        rows = (line for line in lines if line.strip())
+    out, errors = [], 0
+    for row in rows:
+        try:
+            if fmt != "csv":
+                row = json.loads(row)
+            out.append(to_line(row, measurement, tag_keys, int_fields))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            errors += 1
+    payload = "\n".join(out).encode()
+    if compress:
+        payload = gzip.compress(payload, compresslevel=5)
+    return len(out), errors, payload
+
+def iter_chunks(path, chunk_size, start_offset=0):
+    """Stream (lines, end_offset, fmt, header) chunks without reading the whole file"""
+    fmt = "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    with open(path, "rb") as f:
+        header = None
+        if fmt == "csv":
+            header = next(csv.reader([f.readline().decode()]))
+        if start_offset > f.tell():
+            f.seek(start_offset)
+        lines = []
+        for raw in f:
+            lines.append(raw.decode())
+            if len(lines) >= chunk_size:
+                yield lines, f.tell(), fmt, header
+                lines = []
+        if lines:
+            yield lines, f.tell(), fmt, header
+
+class Checkpoint:
+    """Per-file byte offset up to which every chunk has been written"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        self._done = {}     # file -> {seq: end_offset} finished out of order
+        self._next = {}     # file -> next seq needed to advance the offset
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.offsets = json.load(f)
+
+    def start(self, file):
+        self._done[file] = {}
+        self._next[file] = 0
+        return self.offsets.get(file, 0)
+
+    def complete(self, file, seq, end_offset):
+        done = self._done[file]
+        done[seq] = end_offset
+        advanced = False
+        while self._next[file] in done:
+            self.offsets[file] = done.pop(self._next[file])
+            self._next[file] += 1
+            advanced = True
+        if advanced and self.path:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.offsets, f)
+            os.replace(tmp, self.path)
+
+class HTTPSender:
+    """Posts gzip line protocol to the InfluxDB v2 write endpoint over pooled connections"""
+
+    def __init__(self, url, token, org, bucket, max_inflight, retries=5):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.requests = requests
+        self.retries = retries
+        self.endpoint = f"{url.rstrip('/')}/api/v2/write"
+        self.params = {"org": org, "bucket": bucket, "precision": "ns"}
+        self.session = requests.Session()
+        self.session.mount(url, HTTPAdapter(pool_maxsize=max_inflight))
+        self.session.headers.update({
+            "Authorization": f"Token {token}",
+            "Content-Type": "text/plain; charset=utf-8",
+            "Content-Encoding": "gzip",
+        })
+        self.compress = True
+
+    def send(self, payload):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.endpoint, params=self.params,
+                                             data=payload, timeout=(5, 60))
+                if response.status_code in RETRY_STATUS and attempt < self.retries:
+                    delay = float(response.headers.get("Retry-After", 2 ** attempt))
+                    time.sleep(min(delay, 30))
+                    continue
+                if 400 <= response.status_code < 500 and response.status_code not in RETRY_STATUS:
+                    raise ChunkRejected(f"HTTP {response.status_code}: {response.text[:200]}")
+                response.raise_for_status()
+                return
+            except (self.requests.exceptions.ConnectionError, self.requests.exceptions.Timeout):
+                if attempt == self.retries:
+                    raise
+                time.sleep(min(2 ** attempt, 30))
+
+    def close(self):
+        self.session.close()
+
+class LocalSender:
+    """Writes line protocol into the embedded store for offline runs"""
+
+    def __init__(self, url):
+        from iot_core import influx_client
+
+        self.db = influx_client(url)
+        self.compress = False
+
+    def send(self, payload):
+        try:
+            self.db.write(record=payload.decode())
+        except (ValueError, IndexError) as e:
+            raise ChunkRejected(str(e)) from e
+
+    def close(self):
+        self.db.close()
+
+def backfill(files, sender, measurement, tag_keys, chunk_size, workers, max_inflight,
+             checkpoint, report_every=5.0, int_fields=()):
+    totals = {"points": 0, "errors": 0, "bytes": 0, "rejected": 0, "rejected_chunks": 0}
+    start = last_report = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as converters, \
+            ThreadPoolExecutor(max_workers=max_inflight) as senders:
+        for path in files:
+            offset = checkpoint.start(path)
+            if offset:
+                print(f"Resuming {path} at byte {offset}")
+            chunks = enumerate(iter_chunks(path, chunk_size, offset))
+            converting, sending = {}, {}
+            exhausted = False
+            chunk_start = offset
+
+            while not exhausted or converting or sending:
+                # Keep workers busy without reading far ahead of the senders
+                while not exhausted and len(converting) < workers * 2 and len(sending) < max_inflight * 2:
+                    try:
+                        seq, (lines, end_offset, fmt, header) = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = converters.submit(convert_chunk, lines, fmt, header,
+                                               measurement, tag_keys, sender.compress, int_fields)
+                    converting[future] = (seq, chunk_start, end_offset)
+                    chunk_start = end_offset
+
+                done, _ = wait(list(converting) + list(sending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in converting:
+                        seq, begin, end_offset = converting.pop(future)
+                        points, errors, payload = future.result()
+                        totals["errors"] += errors
+                        if points:
+                            sending[senders.submit(sender.send, payload)] = (seq, begin, end_offset,
+                                                                             points, len(payload))
+                        else:
+                            checkpoint.complete(path, seq, end_offset)
+                    else:
+                        seq, begin, end_offset, points, size = sending.pop(future)
+                        try:
+                            future.result()
+                        except ChunkRejected as e:
+                            # Resending the same bytes fails the same way, so report and move on
+                            totals["rejected"] += points
+                            totals["rejected_chunks"] += 1
+                            print(f"  ✗ {path} bytes {begin}-{end_offset}: {points} points rejected ({e})")
+                        else:
+                            totals["points"] += points
+                            totals["bytes"] += size
+                        checkpoint.complete(path, seq, end_offset)
+
+                now = time.perf_counter()
+                if now - last_report >= report_every:
+                    elapsed = now - start
+                    print(f"  {totals['points']:,} points, {totals['points'] / elapsed:,.0f} points/s, "
+                          f"{totals['bytes'] / elapsed / 1e6:.1f} MB/s sent")
+                    last_report = now
+
+    elapsed = time.perf_counter() - start
+    print("-" * 60)
+    print(f"Wrote {totals['points']:,} points in {elapsed:.1f}s "
+          f"({totals['points'] / elapsed:,.0f} points/s sustained)")
+    if totals["errors"]:
+        print(f"Skipped {totals['errors']} unparseable rows")
+    if totals["rejected"]:
+        print(f"✗ {totals['rejected']:,} points in {totals['rejected_chunks']} chunk(s) were rejected "
+              f"by the database; fix those byte ranges and backfill them separately")
+    return totals
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backfill CSV/JSONL sensor exports into InfluxDB")
+    parser.add_argument("files", nargs="+", help=".csv or .jsonl files")
+    parser.add_argument("--measurement", default="sensor",
+                        help="used when a row has no measurement column")
+    parser.add_argument("--tags", default="device_id,device_type,location",
+                        help="comma-separated columns written as tags")
+    parser.add_argument("--int-fields", default="",
+                        help="comma-separated fields written as integers (all others are floats)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per request")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="conversion processes")
+    parser.add_argument("--max-inflight", type=int, default=4, help="concurrent write requests")
+    parser.add_argument("--checkpoint", default="backfill.checkpoint.json",
+                        help="progress file for resuming; empty string disables")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--bucket", default=BUCKET)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.url.startswith(("memory://", "file://")):
+        sender = LocalSender(args.url)
+    else:
+        sender = HTTPSender(args.url, TOKEN, ORG, args.bucket, args.max_inflight)
+
+    print(f"Backfilling {len(args.files)} file(s) into {args.url} "
+          f"(chunk {args.chunk_size}, {args.workers} workers, {args.max_inflight} in flight)")
+    try:
+        totals = backfill(args.files, sender, args.measurement,
+                 tuple(t for t in args.tags.split(",") if t), args.chunk_size,
+                 args.workers, args.max_inflight, Checkpoint(args.checkpoint),
+                 int_fields=frozenset(f for f in args.int_fields.split(",") if f))
+    except KeyboardInterrupt:
+        print("\nInterrupted; rerun the same command to resume from the checkpoint")
+        sys.exit(1)
+    finally:
+        sender.close()
+    if totals["rejected"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
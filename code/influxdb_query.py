@@ -2,17 +2,14 @@
 Query data from InfluxDB using Flux
 """
 
-from influxdb_client import InfluxDBClient
-import os
-from dotenv import load_dotenv
+from iot_core import get_config, influx_client
 
-load_dotenv()
-
-# InfluxDB Configuration
-URL = os.getenv("INFLUXDB_URL", "http://localhost:8086")
-TOKEN = os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token")
-ORG = os.getenv("INFLUXDB_ORG", "iot-org")
-BUCKET = os.getenv("INFLUXDB_BUCKET", "iot-data")
+# InfluxDB Configuration (memory:// or file:///path selects the local store)
+config = get_config()
+URL = config.influxdb_url
+TOKEN = config.influxdb_token
+ORG = config.influxdb_org
+BUCKET = config.influxdb_bucket
 
 def main():
     print("Connecting to InfluxDB...")
@@ -22,7 +19,7 @@ def main():
     print()
     
     # Create client
-    client = InfluxDBClient(url=URL, token=TOKEN, org=ORG)
+    client = influx_client(URL, TOKEN, ORG)
     query_api = client.query_api()
     
     # Query 1: Get all temperature data from last hour
@@ -2,19 +2,16 @@
 Write data to InfluxDB time-series database
 """
 
-from influxdb_client import InfluxDBClient, Point
-from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client import Point
 from datetime import datetime
-import os
-from dotenv import load_dotenv
+from iot_core import get_config, influx_client, sync_write_api
 
-load_dotenv()
-
-# InfluxDB Configuration
-URL = os.getenv("INFLUXDB_URL", "http://localhost:8086")
-TOKEN = os.getenv("INFLUXDB_TOKEN", "my-super-secret-auth-token")
-ORG = os.getenv("INFLUXDB_ORG", "iot-org")
-BUCKET = os.getenv("INFLUXDB_BUCKET", "iot-data")
+# InfluxDB Configuration (memory:// or file:///path selects the local store)
+config = get_config()
+URL = config.influxdb_url
+TOKEN = config.influxdb_token
+ORG = config.influxdb_org
+BUCKET = config.influxdb_bucket
 
 def main():
     print("Connecting to InfluxDB...")
@@ -24,8 +21,8 @@ def main():
     print()
     
     # Create client
-    client = InfluxDBClient(url=URL, token=TOKEN, org=ORG)
-    write_api = client.write_api(write_options=SYNCHRONOUS)
+    client = influx_client(URL, TOKEN, ORG)
+    write_api = sync_write_api(client)
     
     # Write a single data point
     print("Example 1: Writing a single data point...")
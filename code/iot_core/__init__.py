@@ -0,0 +1,7 @@
+"""
+Shared configuration and lazily imported client factories
+"""
+
+from iot_core.config import Config, get_config
+from iot_core.clients import mqtt_client, influx_client, sync_write_api, api_client
+from iot_core.instrumentation import Instrumentation, get_instrumentation
@@ -0,0 +1,55 @@
+"""
+Pieces shared by the sync and async Flask API clients
+"""
+
+import gzip
+import json
+import threading
+
+# Status codes worth retrying on idempotent calls
+RETRY_STATUS = (502, 503, 504)
+
+class APIClientBase:
+    """Per-endpoint latency counters and JSON body encoding
+
+    Subclasses set compress and compress_min_bytes and call
+    _init_stats() from __init__.
+    """
+
+    def _init_stats(self):
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _record(self, endpoint, elapsed, ok):
+        """Update per-endpoint latency counters"""
+        with self._stats_lock:
+            entry = self.stats.setdefault(endpoint, {
+                "count": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0
+            })
+            entry["count"] += 1
+            entry["total_time"] += elapsed
+            entry["max_time"] = max(entry["max_time"], elapsed)
+            if not ok:
+                entry["errors"] += 1
+
+    def _encode(self, payload):
+        """Serialize a JSON body, gzipping it when enabled and large enough"""
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.compress and len(body) >= self.compress_min_bytes:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def get_stats(self):
+        """Return latency counters with averages, in milliseconds"""
+        with self._stats_lock:
+            return {
+                endpoint: {
+                    "count": entry["count"],
+                    "errors": entry["errors"],
+                    "avg_ms": round(entry["total_time"] / entry["count"] * 1000, 2),
+                    "max_ms": round(entry["max_time"] * 1000, 2),
+                }
+                for endpoint, entry in self.stats.items()
+            }
@@ -0,0 +1,56 @@
+"""
+Client factories; each imports its library only when first called
+"""
+
+import socket
+
+from iot_core.config import get_config
+
+def _set_nodelay(client, userdata, sock):
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (OSError, AttributeError):
+        # Websocket and TLS wrappers may not expose setsockopt
+        pass
+
+def mqtt_client(client_id="", nodelay=True, **kwargs):
+    """New paho MQTT client with credentials from the config applied"""
+    import paho.mqtt.client as mqtt
+
+    config = get_config()
+    client = mqtt.Client(client_id=client_id, **kwargs)
+    if config.mqtt_username:
+        client.username_pw_set(config.mqtt_username, config.mqtt_password)
+    if nodelay:
+        # paho leaves Nagle on; once a client both publishes and receives,
+        # delayed ACKs hold small packets back by ~40ms
+        client.on_socket_open = _set_nodelay
+    return client
+
+def influx_client(url=None, token=None, org=None):
+    """InfluxDBClient for http(s) URLs, LocalTSDB for memory:// or file:// URLs"""
+    config = get_config()
+    url = url or config.influxdb_url
+    if url.startswith("memory://"):
+        from local_tsdb import LocalTSDB
+        return LocalTSDB()
+    if url.startswith("file://"):
+        from local_tsdb import LocalTSDB
+        return LocalTSDB(url[len("file://"):])
+
+    from influxdb_client import InfluxDBClient
+    return InfluxDBClient(url=url, token=token or config.influxdb_token,
+                          org=org or config.influxdb_org)
+
+def sync_write_api(client):
+    """Blocking write API for either kind of client"""
+    if hasattr(client, "write_columns"):
+        # LocalTSDB writes are always synchronous
+        return client.write_api()
+    from influxdb_client.client.write_api import SYNCHRONOUS
+    return client.write_api(write_options=SYNCHRONOUS)
+
+def api_client():
+    """Shared pooled Flask API client"""
+    from api_client import get_client
+    return get_client()
@@ -0,0 +1,63 @@
+"""
+Measure cold start of each entry point: python -m iot_core.coldstart [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIMULATOR_DIR = os.path.join(os.path.dirname(CODE_DIR), "Simulator")
+
+HEAVY_MODULES = ("paho", "influxdb_client", "requests", "aiohttp", "numpy")
+
+# Imports the module the way `python <script>` would, minus running main()
+PROBE = """
+import importlib, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+heavy = sorted({m.split('.')[0] for m in sys.modules} & set(sys.argv[2].split(',')))
+print(f"{elapsed * 1000:.2f} {','.join(heavy) or '-'}")
+"""
+
+def entry_points():
+    for directory in (CODE_DIR, SIMULATOR_DIR):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".py"):
+                continue
+            with open(os.path.join(directory, name)) as f:
+                if "__main__" in f.read():
+                    yield directory, name[:-3]
+
+def measure(directory, module, runs):
+    import_ms, process_ms, heavy = [], [], "-"
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([directory, CODE_DIR]),
+           "PYTHONDONTWRITEBYTECODE": "1"}
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", PROBE, module, ",".join(HEAVY_MODULES)],
+                                cwd=directory, env=env, capture_output=True, text=True)
+        process_ms.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            return None, None, result.stderr.strip().splitlines()[-1]
+        value, heavy = result.stdout.split()
+        import_ms.append(float(value))
+    return statistics.median(import_ms), statistics.median(process_ms), heavy
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"Median of {runs} cold starts per entry point")
+    print(f"{'entry point':<28} {'import':>9} {'process':>9}  heavy modules loaded")
+    print("-" * 78)
+    for directory, module in entry_points():
+        import_ms, process_ms, heavy = measure(directory, module, runs)
+        if import_ms is None:
+            print(f"{module:<28} {'failed':>9} {'':>9}  {heavy}")
+        else:
+            print(f"{module:<28} {import_ms:>7.1f}ms {process_ms:>7.1f}ms  {heavy}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Single cached configuration object read from the environment and .env
+"""
+
+import os
+from functools import lru_cache
+
+class Config:
+    """Connection settings shared by every script"""
+
+    def __init__(self, env=None):
+        env = os.environ if env is None else env
+
+        # MQTT Broker
+        self.mqtt_broker = env.get("MQTT_BROKER", "localhost")
+        self.mqtt_port = int(env.get("MQTT_PORT", 1883))
+        self.mqtt_username = env.get("MQTT_USERNAME") or None
+        self.mqtt_password = env.get("MQTT_PASSWORD") or None
+
+        # InfluxDB (memory:// or file:///path selects the local store)
+        self.influxdb_url = env.get("INFLUXDB_URL", "http://localhost:8086")
+        self.influxdb_token = env.get("INFLUXDB_TOKEN", "my-super-secret-auth-token")
+        self.influxdb_org = env.get("INFLUXDB_ORG", "iot-org")
+        self.influxdb_bucket = env.get("INFLUXDB_BUCKET", "iot-data")
+
+        # Flask API
+        self.flask_api_url = env.get("FLASK_API_URL", "http://localhost:5000")
+        self.flask_api_replicas = env.get("FLASK_API_REPLICAS", self.flask_api_url).split(",")
+
+        # Node-RED
+        self.node_red_url = env.get("NODE_RED_URL", "http://localhost:1880")
+
+        # Instrumentation (SIGUSR1 toggles it at runtime)
+        self.instrument = env.get("IOT_INSTRUMENT", "").lower() in ("1", "true", "yes", "on")
+        self.metrics_file = env.get("IOT_METRICS_FILE") or None
+        self.metrics_port = int(env.get("IOT_METRICS_PORT") or 0) or None
+        self.metrics_host = env.get("IOT_METRICS_HOST", "127.0.0.1")
+        self.metrics_interval = float(env.get("IOT_METRICS_INTERVAL", 30))
+
+    def __repr__(self):
+        return f"Config(mqtt={self.mqtt_broker}:{self.mqtt_port}, influxdb={self.influxdb_url})"
+
+@lru_cache(maxsize=None)
+def get_config():
+    """Load .env once and return the process-wide Config"""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    return Config()
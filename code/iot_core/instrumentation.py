@@ -0,0 +1,370 @@
+"""
+Opt-in profiling, memory tracking and counters for long-running services
+
+Counters are always kept (they are plain integer updates). Reporting,
+the sampling profiler and tracemalloc only run while enabled, either
+from IOT_INSTRUMENT=1 at startup or by sending SIGUSR1 to toggle them
+on a running process.
+"""
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from iot_core.config import get_config
+
+# tracemalloc, the SIGUSR1 handler and the metrics port are process-wide, so every instance shares them
+_process_lock = threading.Lock()
+_tracemalloc_users = set()      # enabled instances relying on tracemalloc we started
+_tracemalloc_started = False
+_signal_targets = []
+_signal_installed = set()       # signal numbers carrying _toggle_all
+_metrics_servers = {}           # (host, port) -> ThreadingHTTPServer serving its .instances
+
+class SamplingProfiler:
+    """Samples every thread's stack with sys._current_frames() at a fixed interval"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._self_counts = {}
+        self._total_counts = {}
+        self._samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}:{code.co_name}"
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own:
+                        continue
+                    self._samples += 1
+                    leaf = self._label(frame)
+                    self._self_counts[leaf] = self._self_counts.get(leaf, 0) + 1
+                    seen = set()
+                    while frame is not None:
+                        label = self._label(frame)
+                        if label not in seen:
+                            seen.add(label)
+                            self._total_counts[label] = self._total_counts.get(label, 0) + 1
+                        frame = frame.f_back
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def take(self, top_n):
+        """Return and reset the top functions by self and cumulative samples"""
+        with self._lock:
+            samples = self._samples or 1
+            result = {
+                "samples": self._samples,
+                "self": [(name, round(n / samples, 4)) for name, n in
+                         sorted(self._self_counts.items(), key=lambda i: -i[1])[:top_n]],
+                "cumulative": [(name, round(n / samples, 4)) for name, n in
+                               sorted(self._total_counts.items(), key=lambda i: -i[1])[:top_n]],
+            }
+            self._self_counts, self._total_counts, self._samples = {}, {}, 0
+        return result
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        with _process_lock:
+            instances = list(self.server.instances)
+        body = "".join(i.render_text() for i in instances).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Instrumentation:
+    """Counters, handler timers and gauges plus optional periodic profile snapshots"""
+
+    def __init__(self, service, metrics_file=None, metrics_port=None, interval=30,
+                 top_n=15, sample_interval=0.01, metrics_host="127.0.0.1"):
+        self.service = service
+        self.metrics_file = metrics_file
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.interval = interval
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.enabled = False
+        self.started = time.time()
+
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}        # name -> [count, total seconds, max seconds]
+        self.gauges = {}        # name -> zero-argument callable
+
+        self._profiler = None
+        self._memory_baseline = None
+        self._last_report = None
+        self._stop = threading.Event()
+        self._reporter = None
+        self._server = None
+
+    # Recording
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                self.timers[name] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def gauge(self, name, fn):
+        """Register a callable sampled at report time, e.g. a queue length"""
+        self.gauges[name] = fn
+
+    # Reporting
+
+    def _read_gauges(self):
+        values = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                values[name] = fn()
+            except Exception as e:
+                values[name] = f"error: {e}"
+        return values
+
+    def _memory_diff(self):
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        baseline, self._memory_baseline = self._memory_baseline, snapshot
+        diff = []
+        if baseline is not None:
+            for stat in snapshot.compare_to(baseline, "lineno")[:self.top_n]:
+                frame = stat.traceback[0]
+                diff.append({"where": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                             "size_diff": stat.size_diff, "count_diff": stat.count_diff,
+                             "size": stat.size})
+        return {"traced": current, "peak": peak, "top_growth": diff}
+
+    def snapshot(self):
+        """Current counters and, when enabled, profile and allocation diffs"""
+        with self._lock:
+            counters = dict(self.counters)
+            timers = {name: {"count": c, "total_s": round(t, 6), "avg_ms": round(t / c * 1000, 3),
+                             "max_ms": round(m * 1000, 3)}
+                      for name, (c, t, m) in self.timers.items()}
+        report = {
+            "service": self.service,
+            "time": time.time(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "counters": counters,
+            "timers": timers,
+            "gauges": self._read_gauges(),
+        }
+        if self.enabled:
+            if self._profiler:
+                report["profile"] = self._profiler.take(self.top_n)
+            report["memory"] = self._memory_diff()
+        return report
+
+    def render_text(self):
+        """Counters, timers and gauges in Prometheus text exposition format"""
+        lines = []
+        label = f'{{service="{self.service}"}}'
+        with self._lock:
+            counters = dict(self.counters)
+            timers = {k: list(v) for k, v in self.timers.items()}
+        for name, value in sorted(counters.items()):
+            lines.append(f"iot_{name}_total{label} {value}")
+        for name, (count, total, peak) in sorted(timers.items()):
+            lines.append(f"iot_{name}_seconds_count{label} {count}")
+            lines.append(f"iot_{name}_seconds_sum{label} {total:.6f}")
+            lines.append(f"iot_{name}_seconds_max{label} {peak:.6f}")
+        for name, value in sorted(self._read_gauges().items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"iot_{name}{label} {value}")
+        if tracemalloc.is_tracing():
+            lines.append(f"iot_traced_memory_bytes{label} {tracemalloc.get_traced_memory()[0]}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self, report):
+        if not self.metrics_file:
+            return
+        with open(self.metrics_file, "a") as f:
+            f.write(json.dumps(report, default=str) + "\n")
+
+    def _run_reporter(self):
+        while not self._stop.wait(self.interval):
+            self._last_report = self.snapshot()
+            self._write(self._last_report)
+
+    # Control
+
+    def _serve_metrics(self):
+        """Join the process-wide metrics server for this host/port, starting it if needed"""
+        address = (self.metrics_host, self.metrics_port)
+        with _process_lock:
+            server = _metrics_servers.get(address)
+            if server is None:
+                try:
+                    server = ThreadingHTTPServer(address, MetricsHandler)
+                except OSError as e:
+                    # Another process owns the port; the metrics file still works
+                    print(f"✗ Metrics endpoint {address[0]}:{address[1]} unavailable: {e}")
+                    return
+                server.instances = []
+                _metrics_servers[address] = server
+                threading.Thread(target=server.serve_forever, name="metrics-http",
+                                 daemon=True).start()
+            server.instances.append(self)
+            self._server = server
+
+    def _leave_metrics(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        with _process_lock:
+            server.instances.remove(self)
+            if server.instances:
+                return
+            del _metrics_servers[server.server_address[:2]]
+        server.shutdown()
+        server.server_close()
+
+    def enable(self):
+        if self.enabled:
+            return
+        global _tracemalloc_started
+        with _process_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_started = True
+            if _tracemalloc_started:
+                _tracemalloc_users.add(self)
+        self._memory_baseline = None
+        self._memory_diff()
+        self._profiler = SamplingProfiler(self.sample_interval)
+        self._profiler.start()
+        self._stop.clear()
+        self._reporter = threading.Thread(target=self._run_reporter, name="metrics-reporter",
+                                          daemon=True)
+        self._reporter.start()
+        if self.metrics_port and self._server is None:
+            self._serve_metrics()
+        # Only now, so a failure above never leaves a half-enabled instance
+        self.enabled = True
+        print(f"Instrumentation enabled for {self.service} "
+              f"(file={self.metrics_file or '-'}, port={self.metrics_port if self._server else '-'})")
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._reporter:
+            self._reporter.join()
+        if self._profiler:
+            self._profiler.stop()
+        # One last report so toggling off never loses the final interval
+        self._write(self.snapshot())
+        self._profiler = None
+        self.enabled = False
+        global _tracemalloc_started
+        with _process_lock:
+            _tracemalloc_users.discard(self)
+            # Leave tracing alone if someone else started it or another service still uses it
+            if _tracemalloc_started and not _tracemalloc_users:
+                tracemalloc.stop()
+                _tracemalloc_started = False
+        self._memory_baseline = None
+        self._leave_metrics()
+        print(f"Instrumentation disabled for {self.service}")
+
+    def toggle(self, signum=None, frame=None):
+        # Signal handlers run on the main thread; start/stop threads off it
+        threading.Thread(target=self.disable if self.enabled else self.enable, daemon=True).start()
+
+    def install_signal(self, signum=None):
+        """Toggle instrumentation on SIGUSR1 (no-op where signals are unavailable)"""
+        signum = signum or getattr(signal, "SIGUSR1", None)
+        if signum is None:
+            return False
+        with _process_lock:
+            if self not in _signal_targets:
+                _signal_targets.append(self)
+            if signum in _signal_installed:
+                return True
+            try:
+                # One handler for the process; it toggles every registered instance
+                signal.signal(signum, _toggle_all)
+            except ValueError:
+                # Not on the main thread
+                return False
+            _signal_installed.add(signum)
+            return True
+
+def _toggle_all(signum=None, frame=None):
+    for instrumentation in list(_signal_targets):
+        instrumentation.toggle(signum, frame)
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+def get_instrumentation(service):
+    """Process-wide instrumentation for a service, configured from the environment"""
+    with _instances_lock:
+        instrumentation = _instances.get(service)
+        if instrumentation is None:
+            config = get_config()
+            instrumentation = _instances[service] = Instrumentation(
+                service,
+                metrics_file=config.metrics_file or f"{service}-metrics.jsonl",
+                metrics_port=config.metrics_port,
+                metrics_host=config.metrics_host,
+                interval=config.metrics_interval,
+            )
+            instrumentation.install_signal()
+            if config.instrument:
+                instrumentation.enable()
+        return instrumentation
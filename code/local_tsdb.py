@@ -0,0 +1,547 @@
+"""
+Embedded columnar time-series store, a local stand-in for InfluxDB
+
+Select it by pointing INFLUXDB_URL at memory:// or file:///path/to/dir;
+iot_core.influx_client() then returns a LocalTSDB instead of an InfluxDBClient.
+"""
+
+import numpy as np
+import json
+import numbers
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+SEGMENT_DTYPE = np.dtype([("t", "<i8"), ("v", "<f8")])
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_DURATION_NS = {"ns": 1, "us": 10**3, "ms": 10**6, "s": 10**9, "m": 60 * 10**9,
+                "h": 3600 * 10**9, "d": 86400 * 10**9, "w": 7 * 86400 * 10**9}
+
+def now_ns():
+    return time.time_ns()
+
+def to_ns(value):
+    """Convert a datetime, ISO string, Flux duration or int to epoch nanoseconds"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        # Integer arithmetic: timestamp() is a float and drops sub-microsecond precision
+        delta = value - EPOCH
+        return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+    value = str(value).strip()
+    if value == "now()":
+        return now_ns()
+    match = re.fullmatch(r"(-?)(\d+)(ns|us|ms|s|m|h|d|w)", value)
+    if match:
+        offset = int(match.group(2)) * _DURATION_NS[match.group(3)]
+        return now_ns() - offset if match.group(1) else now_ns() + offset
+    if value.lstrip("-").isdigit():
+        return int(value)
+    return to_ns(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+def _split_unescaped(text, sep):
+    """Split on sep, ignoring escaped separators and separators inside quotes"""
+    if "\\" not in text and '"' not in text:
+        return text.split(sep)
+    parts, current, quoted, escaped = [], [], False, False
+    for ch in text:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == "\\":
+            current.append(ch)
+            escaped = True
+        elif ch == '"':
+            current.append(ch)
+            quoted = not quoted
+        elif ch == sep and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+def _unescape(text):
+    return re.sub(r"\\(.)", r"\1", text) if "\\" in text else text
+
+def _parse_field_value(raw):
+    if raw.startswith('"'):
+        return _unescape(raw[1:-1])
+    if raw[-1] == "i" or raw[-1] == "u":
+        return int(raw[:-1])
+    if raw in ("t", "T", "true", "True", "TRUE"):
+        return True
+    if raw in ("f", "F", "false", "False", "FALSE"):
+        return False
+    return float(raw)
+
+def parse_line_protocol(line):
+    """Parse one line of InfluxDB line protocol into (measurement, tags, fields, time_ns)"""
+    sections = _split_unescaped(line.strip(), " ")
+    series, field_set = sections[0], sections[1]
+    timestamp = int(sections[2]) if len(sections) > 2 and sections[2] else None
+
+    series_parts = _split_unescaped(series, ",")
+    measurement = _unescape(series_parts[0])
+    tags = {}
+    for part in series_parts[1:]:
+        key, value = _split_unescaped(part, "=")
+        tags[_unescape(key)] = _unescape(value)
+
+    fields = {}
+    for part in _split_unescaped(field_set, ","):
+        key, value = part.split("=", 1) if "\\" not in part else _split_unescaped(part, "=")
+        fields[_unescape(key)] = _parse_field_value(value)
+    return measurement, tags, fields, timestamp
+
+class Record:
+    """Query result row with the FluxRecord accessors the readers use"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def get_time(self):
+        t = self.values.get("_time")
+        return None if t is None else datetime.fromtimestamp(t / 10**9, tz=timezone.utc)
+
+    def get_value(self):
+        return self.values.get("_value")
+
+    def get_field(self):
+        return self.values.get("_field")
+
+    def get_measurement(self):
+        return self.values.get("_measurement")
+
+    def __repr__(self):
+        return f"Record({self.values})"
+
+class Table:
+    def __init__(self, records):
+        self.records = records
+
+class Series:
+    """One measurement/tag-set/field column: write buffers plus immutable segments"""
+
+    def __init__(self, key):
+        self.key = key
+        self.times = []         # point-at-a-time writes
+        self.values = []
+        self.chunks = []        # array writes, kept as arrays until sealed
+        self.buffered = 0
+        self.segments = []      # sorted structured arrays, in memory or memory-mapped
+        self.last_text = None   # newest non-numeric value, kept as metadata only
+
+    def append(self, t, v):
+        self.times.append(t)
+        self.values.append(v)
+        self.buffered += 1
+
+    def extend(self, times, values):
+        chunk = np.empty(len(times), dtype=SEGMENT_DTYPE)
+        chunk["t"] = times
+        chunk["v"] = values
+        self.chunks.append(chunk)
+        self.buffered += len(chunk)
+
+    def _buffer(self):
+        chunks = list(self.chunks)
+        if self.times:
+            chunk = np.empty(len(self.times), dtype=SEGMENT_DTYPE)
+            chunk["t"] = self.times
+            chunk["v"] = self.values
+            chunks.append(chunk)
+        if not chunks:
+            return None
+        return np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+
+    def seal(self):
+        """Turn the write buffers into one sorted array segment"""
+        segment = self._buffer()
+        if segment is None:
+            return None
+        segment.sort(order="t", kind="stable")
+        self.times, self.values, self.chunks, self.buffered = [], [], [], 0
+        return segment
+
+    def scan(self, start=None, stop=None):
+        """Return (times, values) within [start, stop) from segments and buffers"""
+        chunks = []
+        for segment in self.segments:
+            t = segment["t"]
+            if not len(t) or (stop is not None and t[0] >= stop) or (start is not None and t[-1] < start):
+                continue
+            lo = 0 if start is None else np.searchsorted(t, start, "left")
+            hi = len(t) if stop is None else np.searchsorted(t, stop, "left")
+            if hi > lo:
+                chunks.append(segment[lo:hi])
+        buffered = self._buffer()
+        if buffered is not None:
+            # Writes land in arrival order; concurrent writers often deliver them out of order
+            if len(buffered) > 1 and np.any(buffered["t"][1:] < buffered["t"][:-1]):
+                buffered = buffered[np.argsort(buffered["t"], kind="stable")]
+            mask = np.ones(len(buffered), dtype=bool)
+            if start is not None:
+                mask &= buffered["t"] >= start
+            if stop is not None:
+                mask &= buffered["t"] < stop
+            chunks.append(buffered[mask])
+        if not chunks:
+            return np.empty(0, dtype="<i8"), np.empty(0, dtype="<f8")
+        if len(chunks) == 1:
+            merged = np.asarray(chunks[0])
+        else:
+            merged = np.concatenate(chunks)
+            merged = merged[np.argsort(merged["t"], kind="stable")]
+        return merged["t"], merged["v"]
+
+class LocalTSDB:
+    """In-process store with the InfluxDBClient write_api/query_api/close surface"""
+
+    def __init__(self, path=None, segment_size=65536):
+        self.path = path
+        self.segment_size = segment_size
+        self.series = {}        # (measurement, tags tuple, field) -> Series
+        self._lock = threading.RLock()
+        self._series_ids = {}
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    # Persistence
+
+    def _index_file(self):
+        return os.path.join(self.path, "index.json")
+
+    def _load(self):
+        if not os.path.exists(self._index_file()):
+            return
+        with open(self._index_file()) as f:
+            index = json.load(f)
+        for entry in index["series"]:
+            key = (entry["measurement"], tuple(tuple(t) for t in entry["tags"]), entry["field"])
+            series = self._get_series(key, entry["id"])
+            for name in entry["segments"]:
+                series.segments.append(np.load(os.path.join(self.path, name), mmap_mode="r"))
+
+    def _save_index(self):
+        entries = []
+        for key, series in self.series.items():
+            series_id = self._series_ids[key]
+            entries.append({
+                "id": series_id,
+                "measurement": key[0],
+                "tags": [list(t) for t in key[1]],
+                "field": key[2],
+                "segments": [f"{series_id}-{i:06d}.npy" for i in range(len(series.segments))],
+            })
+        tmp = self._index_file() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"series": entries}, f)
+        os.replace(tmp, self._index_file())
+
+    def _get_series(self, key, series_id=None):
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = Series(key)
+            self._series_ids[key] = series_id if series_id is not None else len(self._series_ids)
+        return series
+
+    def _seal(self, key, series):
+        segment = series.seal()
+        if segment is None:
+            return
+        if self.path:
+            name = f"{self._series_ids[key]}-{len(series.segments):06d}.npy"
+            file = os.path.join(self.path, name)
+            np.save(file, segment)
+            segment = np.load(file, mmap_mode="r")
+        series.segments.append(segment)
+
+    def flush(self):
+        """Seal every write buffer into a segment file"""
+        with self._lock:
+            for key, series in self.series.items():
+                self._seal(key, series)
+            if self.path:
+                self._save_index()
+
+    # Writes
+
+    def write_point(self, measurement, tags, fields, timestamp=None):
+        t = now_ns() if timestamp is None else to_ns(timestamp)
+        tag_key = tuple(sorted(tags.items()))
+        with self._lock:
+            for field, value in fields.items():
+                series = self._get_series((measurement, tag_key, field))
+                if isinstance(value, (numbers.Real, np.number)):
+                    series.append(t, float(value))
+                    if series.buffered >= self.segment_size:
+                        self._seal((measurement, tag_key, field), series)
+                else:
+                    series.last_text = (t, value)
+
+    def write_columns(self, measurement, tags, field, times, values):
+        """Bulk append one series from arrays; the fast path for ingest"""
+        tag_key = tuple(sorted(tags.items()))
+        key = (measurement, tag_key, field)
+        with self._lock:
+            series = self._get_series(key)
+            series.extend(times, values)
+            if series.buffered >= self.segment_size:
+                self._seal(key, series)
+
+    def write(self, bucket=None, org=None, record=None, **kwargs):
+        """Accepts what write_api.write accepts: Points, line protocol, dicts or lists"""
+        if record is None:
+            return
+        if isinstance(record, (list, tuple)):
+            for item in record:
+                self.write(bucket, org, item)
+            return
+        if isinstance(record, bytes):
+            record = record.decode()
+        if isinstance(record, dict):
+            self.write_point(record["measurement"], record.get("tags", {}),
+                             record["fields"], record.get("time"))
+            return
+        if hasattr(record, "to_line_protocol"):
+            record = record.to_line_protocol()
+        for line in record.splitlines():
+            if line.strip() and not line.startswith("#"):
+                self.write_point(*parse_line_protocol(line))
+
+    def write_api(self, write_options=None, **kwargs):
+        return self
+
+    def query_api(self, **kwargs):
+        return self
+
+    def close(self):
+        self.flush()
+
+    # Reads
+
+    def _matching(self, measurement=None, field=None, tags=None):
+        with self._lock:
+            items = list(self.series.items())
+        for (m, tag_key, f), series in items:
+            if measurement is not None and m != measurement:
+                continue
+            if field is not None and f != field:
+                continue
+            tag_dict = dict(tag_key)
+            if tags and any(tag_dict.get(k) != v for k, v in tags.items()):
+                continue
+            yield m, tag_dict, f, series
+
+    def range(self, measurement=None, field="value", start=None, stop=None, tags=None):
+        """Yield (tags, times_ns, values) per matching series within [start, stop)"""
+        start, stop = to_ns(start), to_ns(stop)
+        for m, tag_dict, f, series in self._matching(measurement, field, tags):
+            with self._lock:
+                times, values = series.scan(start, stop)
+            if len(times):
+                yield {"_measurement": m, "_field": f, **tag_dict}, times, values
+
+    def _grouped(self, measurement, field, start, stop, tags, group_by):
+        groups = {}
+        for columns, times, values in self.range(measurement, field, start, stop, tags):
+            key = tuple(columns.get(c) for c in group_by)
+            groups.setdefault(key, []).append((times, values))
+        return groups
+
+    def last(self, measurement=None, field="value", group_by=("device_id",), start=None,
+             stop=None, tags=None):
+        """Newest (time_ns, value) per group"""
+        result = {}
+        for key, parts in self._grouped(measurement, field, start, stop, tags, group_by).items():
+            best = max(parts, key=lambda p: p[0][-1])
+            result[key] = (int(best[0][-1]), float(best[1][-1]))
+        return result
+
+    def aggregate(self, fn, measurement=None, field="value", group_by=("device_id",),
+                  start=None, stop=None, tags=None):
+        """Grouped mean/min/max/sum/count over a time range"""
+        reducers = {"mean": np.mean, "min": np.min, "max": np.max, "sum": np.sum,
+                    "count": len}
+        reduce = reducers[fn]
+        result = {}
+        for key, parts in self._grouped(measurement, field, start, stop, tags, group_by).items():
+            values = np.concatenate([p[1] for p in parts])
+            result[key] = float(reduce(values))
+        return result
+
+    def _check_supported(self, query):
+        """Reject Flux this store cannot answer instead of returning unfiltered rows"""
+        stages = [stage.strip() for stage in query.strip().split("|>")]
+        if not re.fullmatch(r"from\(\s*bucket:\s*[^)]*\)", stages[0]):
+            raise NotImplementedError(f"LocalTSDB query must start with from(bucket: ...): {stages[0]!r}")
+        reducers = 0
+        for stage in stages[1:]:
+            name = re.match(r"(\w+)\(", stage)
+            name = name.group(1) if name else stage
+            if name == "filter":
+                body = re.fullmatch(r"filter\(\s*fn:\s*\(r\)\s*=>\s*(.*)\)", stage, re.S)
+                terms = re.split(r"\s+and\s+", body.group(1).strip()) if body else [stage]
+                for term in terms:
+                    if not (re.fullmatch(r'r\["?[\w.-]+"?\]\s*==\s*"[^"]*"', term) or
+                            re.fullmatch(r'r\.\w+\s*==\s*"[^"]*"', term)):
+                        raise NotImplementedError(
+                            f"LocalTSDB filters support only r[\"tag\"] == \"value\" joined by and: {term!r}")
+            elif name in ("mean", "min", "max", "sum", "count", "last", "first"):
+                if stage != f"{name}()":
+                    raise NotImplementedError(f"LocalTSDB does not support arguments to {name}(): {stage!r}")
+                reducers += 1
+            elif name not in ("range", "group", "limit", "yield"):
+                raise NotImplementedError(f"LocalTSDB does not support Flux stage {stage!r}")
+        if reducers > 1:
+            raise NotImplementedError("LocalTSDB supports at most one aggregate per query")
+
+    def query(self, query, org=None, **kwargs):
+        """Run the Flux subset used in this repo: range, filter ==, group, mean/min/max/last, limit
+
+        Anything else raises NotImplementedError rather than answering wrongly.
+        """
+        self._check_supported(query)
+        start = re.search(r"range\(\s*start:\s*([^,\)]+)", query)
+        stop = re.search(r"range\([^)]*stop:\s*([^,\)]+)", query)
+        filters = dict(re.findall(r'r\["?([\w.-]+)"?\]\s*==\s*"([^"]*)"', query))
+        filters.update(re.findall(r'r\.([\w]+)\s*==\s*"([^"]*)"', query))
+        group = re.search(r"group\(\s*columns:\s*\[([^\]]*)\]", query)
+        limit = re.search(r"limit\(\s*n:\s*(\d+)", query)
+        reducer = re.search(r"\|>\s*(mean|min|max|sum|count|last|first)\(\)", query)
+
+        measurement = filters.pop("_measurement", None)
+        field = filters.pop("_field", None)
+        start = start.group(1).strip() if start else None
+        stop = stop.group(1).strip() if stop else None
+
+        if group is not None or reducer is not None:
+            # Without group() every series is its own table, as in Flux
+            group_by = tuple(re.findall(r'"([^"]+)"', group.group(1))) if group else None
+            tables = {}
+            for columns, times, values in self.range(measurement, field, start, stop, filters):
+                if group_by is None:
+                    key = tuple(sorted(columns.items()))
+                else:
+                    key = tuple((c, columns.get(c)) for c in group_by)
+                tables.setdefault(key, []).append((columns, times, values))
+            result = []
+            for key, parts in tables.items():
+                result.append(Table(self._reduce(parts, dict(key),
+                                                 reducer.group(1) if reducer else None, limit)))
+            return result
+
+        result = []
+        for columns, times, values in self.range(measurement, field, start, stop, filters):
+            n = len(times) if not limit else min(len(times), int(limit.group(1)))
+            result.append(Table([Record({**columns, "_time": int(t), "_value": float(v)})
+                                 for t, v in zip(times[:n], values[:n])]))
+        return result
+
+    def _reduce(self, parts, base, reducer, limit):
+        if reducer in ("last", "first"):
+            pick = max if reducer == "last" else min
+            idx = -1 if reducer == "last" else 0
+            columns, times, values = pick(parts, key=lambda p: p[1][idx])
+            return [Record({**columns, "_time": int(times[idx]), "_value": float(values[idx])})]
+        if reducer:
+            values = np.concatenate([p[2] for p in parts])
+            fn = {"mean": np.mean, "min": np.min, "max": np.max, "sum": np.sum, "count": len}[reducer]
+            return [Record({**base, "_measurement": parts[0][0]["_measurement"],
+                            "_field": parts[0][0]["_field"], "_value": float(fn(values))})]
+        times = np.concatenate([p[1] for p in parts])
+        values = np.concatenate([p[2] for p in parts])
+        order = np.argsort(times, kind="stable")
+        n = len(order) if not limit else min(len(order), int(limit.group(1)))
+        return [Record({**base, "_time": int(times[i]), "_value": float(values[i])}) for i in order[:n]]
+
+def check_out_of_order():
+    """Unsealed writes that arrive out of time order must still read back sorted"""
+    db = LocalTSDB()
+    db.write(record="reading,device_id=d1 t=2.0 2000\nreading,device_id=d1 t=1.0 1000\n"
+                    "reading,device_id=d1 t=3.0 1500")
+    checks = {
+        "last()": db.last("reading", "t") == {("d1",): (2000, 2.0)},
+        "|> last()": [r.get_value() for t in db.query(
+            'from(bucket: "b") |> range(start: 0) |> filter(fn: (r) => r._field == "t") |> last()')
+            for r in t.records] == [2.0],
+        "|> limit(n: 1)": [r.get_value() for t in db.query(
+            'from(bucket: "b") |> range(start: 0) |> filter(fn: (r) => r._field == "t") |> limit(n: 1)')
+            for r in t.records] == [1.0],
+        "range()": [list(times) for _, times, _ in db.range("reading", "t", 0, 2500)] == [[1000, 1500, 2000]],
+    }
+    for name, ok in checks.items():
+        print(f"{'✓' if ok else '✗'} out-of-order writes: {name}")
+    return all(checks.values())
+
+def main():
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark LocalTSDB ingest and queries")
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--points", type=int, default=200, help="points per device")
+    parser.add_argument("--line-protocol", type=int, default=50000,
+                        help="points to ingest through the line protocol path")
+    args = parser.parse_args()
+
+    if not check_out_of_order():
+        raise SystemExit(1)
+
+    with tempfile.TemporaryDirectory() as path:
+        db = LocalTSDB(path)
+        total = args.devices * args.points
+        base = now_ns() - args.points * 10**9
+        times = base + np.arange(args.points, dtype="<i8") * 10**9
+        rng = np.random.default_rng(0)
+
+        start = time.perf_counter()
+        for i in range(args.devices):
+            db.write_columns("temperature", {"device_id": f"temp-{i:05d}", "location": f"room-{i % 50}"},
+                             "value", times, 20 + rng.standard_normal(args.points))
+        elapsed = time.perf_counter() - start
+        print(f"Columnar ingest: {total} points in {elapsed:.2f}s ({total / elapsed:,.0f} points/s)")
+        start = time.perf_counter()
+        db.flush()
+        print(f"Flush to {len(db.series)} segment files: {time.perf_counter() - start:.2f}s")
+
+        lines = [f"humidity,device_id=hum-{i % 1000:04d} value={50 + i % 7},unit=\"percent\" {base + i}"
+                 for i in range(args.line_protocol)]
+        start = time.perf_counter()
+        db.write(record="\n".join(lines))
+        elapsed = time.perf_counter() - start
+        print(f"Line protocol:   {len(lines)} points in {elapsed:.2f}s ({len(lines) / elapsed:,.0f} points/s)")
+
+        start = time.perf_counter()
+        means = db.aggregate("mean", "temperature", group_by=("location",), start="-1h")
+        elapsed = time.perf_counter() - start
+        print(f"Grouped mean over {total} points: {len(means)} groups in {elapsed * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        latest = db.last("temperature")
+        elapsed = time.perf_counter() - start
+        print(f"last() per device: {len(latest)} devices in {elapsed * 1000:.1f}ms")
+
+        start = time.perf_counter()
+        tables = db.query('''
+        from(bucket: "iot-data")
+          |> range(start: -1h)
+          |> filter(fn: (r) => r["_measurement"] == "temperature")
+          |> filter(fn: (r) => r["device_id"] == "temp-00042")
+        ''')
+        elapsed = time.perf_counter() - start
+        print(f"Range scan of one device: {sum(len(t.records) for t in tables)} records in {elapsed * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,17 @@
 Publish messages to MQTT topics
 """
 
-import paho.mqtt.client as mqtt
+import argparse
+import bisect
 import json
+import threading
 import time
 from datetime import datetime
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from iot_core import get_config, mqtt_client
 
 # MQTT Configuration
-BROKER = os.getenv("MQTT_BROKER", "localhost")
-PORT = int(os.getenv("MQTT_PORT", 1883))
+BROKER = get_config().mqtt_broker
+PORT = get_config().mqtt_port
 TOPIC = "sensors/temperature"
 
 # Callback functions
@@ -28,9 +27,161 @@ def on_publish(client, userdata, mid):
     """Callback when message is published"""
     print(f"  Message published: {mid}")
 
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")]
+
+class PipelinedPublisher:
+    """Keeps up to `window` QoS 1/2 messages in flight and times each ack"""
+
+    def __init__(self, client, window=32):
+        self.client = client
+        self.window = window
+        self.cond = threading.Condition()
+        self.inflight = {}      # mid -> send time
+        self.early_acks = {}    # mid -> ack time, when on_publish beats publish()
+        self.publishing = 0     # QoS 1/2 publish() calls that have not returned yet
+        self.latencies = []     # seconds, one per acked message
+        self.stall_time = 0.0   # time spent waiting for a free window slot
+        self.sent = 0
+        client.max_inflight_messages_set(window)
+        client.on_publish = self.on_publish
+
+    def on_publish(self, client, userdata, mid):
+        now = time.perf_counter()
+        # paho holds its message lock here, so only touch our own state
+        with self.cond:
+            sent_at = self.inflight.pop(mid, None)
+            if sent_at is None:
+                # Only a QoS 1/2 publish() still in progress can own an unknown mid;
+                # otherwise it is a QoS 0 completion, which is not timed
+                if self.publishing:
+                    self.early_acks[mid] = now
+                return
+            self.latencies.append(now - sent_at)
+            self.cond.notify_all()
+
+    def send(self, topic, payload, qos=1):
+        """Publish once a window slot is free; blocks instead of queuing without bound"""
+        if qos == 0:
+            info = self.client.publish(topic, payload, qos=qos)
+            with self.cond:
+                self.sent += 1
+            return info
+        with self.cond:
+            if len(self.inflight) >= self.window:
+                start = time.perf_counter()
+                while len(self.inflight) >= self.window:
+                    self.cond.wait()
+                self.stall_time += time.perf_counter() - start
+            self.publishing += 1
+        sent_at = time.perf_counter()
+        try:
+            info = self.client.publish(topic, payload, qos=qos)
+        except BaseException:
+            with self.cond:
+                self.publishing -= 1
+            raise
+        with self.cond:
+            # Same lock hold as registering the mid, so its ack cannot be dropped in between
+            self.publishing -= 1
+            self.sent += 1
+            acked_at = self.early_acks.pop(info.mid, None)
+            if acked_at is not None:
+                self.latencies.append(acked_at - sent_at)
+            else:
+                self.inflight[info.mid] = sent_at
+            if not self.publishing:
+                # Anything left was parked by a QoS 0 completion racing this publish
+                self.early_acks.clear()
+        return info
+
+    def drain(self, timeout=30):
+        """Wait for every in-flight message to be acknowledged"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def histogram(self):
+        counts = [0] * len(LATENCY_BUCKETS_MS)
+        for latency in self.latencies:
+            counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1000)] += 1
+        return list(zip(LATENCY_BUCKETS_MS, counts))
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+def run_throughput(client, count, rate, qos, window, payload_size):
+    """Publish `count` messages as fast as `rate` allows (0 = unlimited) and report"""
+    publisher = PipelinedPublisher(client, window)
+    padding = "x" * payload_size
+    interval = 1.0 / rate if rate else 0.0
+
+    print(f"Throughput mode: {count} messages, QoS {qos}, window {window}, "
+          f"rate {rate or 'unlimited'} msg/s")
+    start = time.perf_counter()
+    next_send = start
+    for i in range(count):
+        if interval:
+            delay = next_send - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_send += interval
+        message = {"seq": i, "sent_at": time.time(), "sensor_id": "temp-001", "pad": padding}
+        publisher.send(TOPIC, json.dumps(message), qos=qos)
+    send_elapsed = time.perf_counter() - start
+    drained = publisher.drain()
+    elapsed = time.perf_counter() - start
+
+    print("-" * 50)
+    print(f"Sent:      {publisher.sent} in {send_elapsed:.2f}s ({publisher.sent / send_elapsed:.0f} msg/s)")
+    if qos > 0:
+        print(f"Acked:     {len(publisher.latencies)} in {elapsed:.2f}s "
+              f"({len(publisher.latencies) / elapsed:.0f} msg/s){'' if drained else ' (timed out)'}")
+        print(f"Latency:   p50 {publisher.percentile(50):.2f}ms  p95 {publisher.percentile(95):.2f}ms  "
+              f"p99 {publisher.percentile(99):.2f}ms")
+        print(f"Stalled:   {publisher.stall_time:.2f}s waiting on the in-flight window "
+              f"({publisher.stall_time / send_elapsed:.0%} of send time)")
+        # A full window most of the time means acks (broker/network) limit throughput;
+        # little stalling below the target rate means the client itself is the limit
+        if publisher.stall_time > send_elapsed / 2:
+            bottleneck = "broker acks"
+        elif rate and publisher.sent / send_elapsed >= rate * 0.95:
+            bottleneck = "none, target rate reached"
+        else:
+            bottleneck = "client"
+        print(f"Bottleneck: {bottleneck}")
+        print("Latency histogram:")
+        for bound, n in publisher.histogram():
+            label = f"<= {bound:g}ms" if bound != float("inf") else "> 1000ms"
+            print(f"  {label:>10} {n:>8} {'#' * min(50, n * 50 // max(1, len(publisher.latencies)))}")
+    return publisher
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Publish sensor messages to MQTT")
+    parser.add_argument("--throughput", action="store_true",
+                        help="pipelined high-rate mode with latency histograms")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=0, help="msg/s, 0 for unlimited")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--window", type=int, default=32,
+                        help="max in-flight QoS 1/2 messages (match the broker's limit)")
+    parser.add_argument("--payload-size", type=int, default=0, help="extra payload bytes")
+    return parser.parse_args()
+
 # Main function
 def main():
-    client = mqtt.Client()
+    args = parse_args()
+    import paho.mqtt.client as mqtt
+    
+    client = mqtt_client()
     client.on_connect = on_connect
     client.on_publish = on_publish
     
@@ -42,6 +193,12 @@ def main():
     # Wait for connection
     time.sleep(1)
     
+    if args.throughput:
+        run_throughput(client, args.count, args.rate, args.qos, args.window, args.payload_size)
+        client.loop_stop()
+        client.disconnect()
+        return
+    
     # Publish messages
     print(f"\nPublishing messages to topic: {TOPIC}")
     print("-" * 50)
@@ -0,0 +1,177 @@
+"""
+Minimal in-process MQTT 3.1.1 broker stand-in for local load and soak tests
+"""
+
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+def topic_matches(pattern, topic):
+    """MQTT wildcard match for + and #"""
+    p_parts = pattern.split("/")
+    t_parts = topic.split("/")
+    for i, part in enumerate(p_parts):
+        if part == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if part != "+" and part != t_parts[i]:
+            return False
+    return len(p_parts) == len(t_parts)
+
+def encode_length(length):
+    out = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        out.append(byte)
+        if not length:
+            return bytes(out)
+
+def packet(ptype, body, flags=0):
+    return bytes([(ptype << 4) | flags]) + encode_length(len(body)) + body
+
+class BrokerHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.request.makefile("rb")
+        self.subscriptions = []
+        self.write_lock = threading.Lock()
+
+    def send(self, data):
+        with self.write_lock:
+            self.request.sendall(data)
+
+    def read_packet(self):
+        header = self.rfile.read(1)
+        if not header:
+            return None, None, None
+        length, multiplier = 0, 1
+        while True:
+            byte = self.rfile.read(1)[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        body = self.rfile.read(length)
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    def deliver(self, topic, payload):
+        body = struct.pack("!H", len(topic)) + topic.encode() + payload
+        try:
+            self.send(packet(PUBLISH, body))
+        except OSError:
+            pass
+
+    def handle(self):
+        broker = self.server
+        try:
+            while True:
+                ptype, flags, body = self.read_packet()
+                if ptype is None or ptype == DISCONNECT:
+                    break
+                if ptype == CONNECT:
+                    self.send(packet(CONNACK, b"\x00\x00"))
+                    with broker.lock:
+                        broker.clients.add(self)
+                elif ptype == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic_len = struct.unpack("!H", body[:2])[0]
+                    topic = body[2:2 + topic_len].decode()
+                    offset = 2 + topic_len
+                    if qos:
+                        mid = body[offset:offset + 2]
+                        offset += 2
+                    if broker.ack_delay:
+                        time.sleep(broker.ack_delay)
+                    broker.route(topic, body[offset:])
+                    if qos == 1:
+                        self.send(packet(PUBACK, mid))
+                    elif qos == 2:
+                        self.send(packet(PUBREC, mid))
+                elif ptype == PUBREL:
+                    self.send(packet(PUBCOMP, body[:2]))
+                elif ptype == SUBSCRIBE:
+                    mid, offset, granted = body[:2], 2, bytearray()
+                    while offset < len(body):
+                        topic_len = struct.unpack("!H", body[offset:offset + 2])[0]
+                        pattern = body[offset + 2:offset + 2 + topic_len].decode()
+                        offset += 2 + topic_len + 1
+                        self.subscriptions.append(pattern)
+                        granted.append(0)
+                    self.send(packet(SUBACK, mid + bytes(granted)))
+                elif ptype == UNSUBSCRIBE:
+                    self.send(packet(UNSUBACK, body[:2]))
+                elif ptype == PINGREQ:
+                    self.send(packet(PINGRESP, b""))
+        except (OSError, IndexError):
+            pass
+        finally:
+            with broker.lock:
+                broker.clients.discard(self)
+
+class StandInBroker(socketserver.ThreadingTCPServer):
+    """Stand-in MQTT broker served from a background thread"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, ack_delay=0.0):
+        super().__init__((host, port), BrokerHandler)
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.ack_delay = ack_delay
+        self.received = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def route(self, topic, payload):
+        with self.lock:
+            self.received += 1
+            targets = [c for c in self.clients
+                       if any(topic_matches(p, topic) for p in c.subscriptions)]
+        for client in targets:
+            client.deliver(topic, payload)
+
+    def drop_clients(self):
+        """Force-close every client connection to simulate a broker outage"""
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.drop_clients()
+        self.shutdown()
+        self.server_close()
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1883
+    broker = StandInBroker("0.0.0.0", port).start()
+    print(f"Stand-in MQTT broker listening on port {broker.port} (Press Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        broker.stop()
+        print(f"\nRouted {broker.received} messages")
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,12 @@
 Subscribe to MQTT topics and receive messages
 """
 
-import paho.mqtt.client as mqtt
 import json
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from iot_core import get_config, mqtt_client
 
 # MQTT Configuration
-BROKER = os.getenv("MQTT_BROKER", "localhost")
-PORT = int(os.getenv("MQTT_PORT", 1883))
+BROKER = get_config().mqtt_broker
+PORT = get_config().mqtt_port
 TOPIC = "sensors/+"
 
 def on_connect(client, userdata, flags, rc):
@@ -45,7 +41,7 @@ def on_subscribe(client, userdata, mid, granted_qos):
 
 def main():
     # Create MQTT client
-    client = mqtt.Client()
+    client = mqtt_client()
     client.on_connect = on_connect
     client.on_message = on_message
     client.on_subscribe = on_subscribe
@@ -2,21 +2,15 @@
 Integrate Python with Node-RED flows
 """
 
-import requests
-import json
-import paho.mqtt.client as mqtt
 from datetime import datetime
-import os
-from dotenv import load_dotenv
+from iot_core import get_config
 
-load_dotenv()
-
-NODE_RED_URL = os.getenv("NODE_RED_URL", "http://localhost:1880")
-MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
-MQTT_PORT = int(os.getenv("MQTT_PORT", 1883))
+NODE_RED_URL = get_config().node_red_url
 
 def get_flows():
     """Get all Node-RED flows"""
+    import requests
+
     try:
         url = f"{NODE_RED_URL}/flows"
         response = requests.get(url)
@@ -26,10 +20,10 @@ def get_flows():
 
 def send_to_node_red_via_mqtt(topic, data):
     """Send data to Node-RED via MQTT"""
-    client = mqtt.Client()
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.publish(topic, json.dumps(data))
-    client.disconnect()
+    # Reuses one connection; queued messages are flushed at exit
+    from persistent_publisher import get_publisher
+
+    return get_publisher().publish(topic, data)
 
 def main():
     # Get flows
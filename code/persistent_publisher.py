@@ -0,0 +1,225 @@
+"""
+Long-lived MQTT publisher shared by dashboard and Node-RED feeds
+"""
+
+import atexit
+import json
+import queue
+import threading
+import time
+from iot_core import get_config, mqtt_client
+
+MQTT_BROKER = get_config().mqtt_broker
+MQTT_PORT = get_config().mqtt_port
+
+# paho.mqtt.client.MQTT_ERR_SUCCESS, without importing paho at module load
+MQTT_ERR_SUCCESS = 0
+
+_STOP = object()
+
+class PersistentPublisher:
+    """One MQTT connection with a send queue, in-flight window and flush on exit"""
+
+    def __init__(self, broker=MQTT_BROKER, port=MQTT_PORT, client_id="",
+                 max_queue=10000, max_inflight=20, keepalive=60):
+        self.max_inflight = max_inflight
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._cond = threading.Condition()
+        self._connected = threading.Event()
+        self._closed = False
+        self._closing = threading.Event()
+        self._pending = 0       # accepted but not yet handed to paho
+        self._inflight = {}     # mid -> qos, awaiting on_publish
+        self._early_acks = set()
+        self._window_used = 0   # QoS 1/2 messages not yet acknowledged
+        self.stats = {"queued": 0, "sent": 0, "acked": 0, "dropped": 0, "reconnects": 0}
+
+        self.client = mqtt_client(client_id=client_id)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_publish = self.on_publish
+        self.client.max_inflight_messages_set(max_inflight)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        # connect_async lets the network loop keep retrying until the broker is up
+        self.client.connect_async(broker, port, keepalive)
+        self.client.loop_start()
+
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+        atexit.register(self.close)
+
+    def on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            self._connected.set()
+        else:
+            print(f"✗ Publisher failed to connect: {rc}")
+
+    def on_disconnect(self, client, userdata, rc):
+        self._connected.clear()
+        with self._cond:
+            # QoS 0 packets still buffered in paho are lost with the socket
+            for mid in [m for m, qos in self._inflight.items() if qos == 0]:
+                del self._inflight[mid]
+            self._cond.notify_all()
+        if rc != 0 and not self._closed:
+            self.stats["reconnects"] += 1
+
+    def on_publish(self, client, userdata, mid):
+        # Never block here: paho holds its message lock while calling us
+        with self._cond:
+            if mid not in self._inflight:
+                self._early_acks.add(mid)
+                return
+            self._ack(self._inflight.pop(mid))
+
+    def _ack(self, qos):
+        # Caller holds self._cond
+        if qos > 0:
+            self._window_used -= 1
+            self.stats["acked"] += 1
+        self._cond.notify_all()
+
+    def publish(self, topic, payload, qos=0, retain=False, block=True, timeout=None):
+        """Queue a message; returns False if the queue stayed full"""
+        if not isinstance(payload, (str, bytes, bytearray)):
+            payload = json.dumps(payload)
+        with self._cond:
+            if self._closed:
+                return False
+            self._pending += 1
+        try:
+            self._queue.put((topic, payload, qos, retain), block=block, timeout=timeout)
+        except queue.Full:
+            with self._cond:
+                self._pending -= 1
+                self.stats["dropped"] += 1
+                self._cond.notify_all()
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def _discard(self, count=1):
+        with self._cond:
+            self._pending -= count
+            self.stats["dropped"] += count
+            self._cond.notify_all()
+
+    def _drain(self):
+        """Drop whatever is still queued; only called while closing"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                self._discard()
+
+    def _send_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP or self._closing.is_set():
+                if item is not _STOP:
+                    self._discard()
+                self._drain()
+                break
+            topic, payload, qos, retain = item
+
+            if qos > 0:
+                with self._cond:
+                    while self._window_used >= self.max_inflight and not self._closing.is_set():
+                        self._cond.wait(0.1)
+                    if not self._closing.is_set():
+                        self._window_used += 1
+
+            while not self._closing.is_set():
+                # Poll so close() can stop a sender waiting on a broker that never comes back
+                if not self._connected.wait(0.1):
+                    continue
+                info = self.client.publish(topic, payload, qos=qos, retain=retain)
+                with self._cond:
+                    if info.mid in self._early_acks:
+                        self._early_acks.discard(info.mid)
+                        self._ack(qos)
+                    elif qos > 0 or info.rc == MQTT_ERR_SUCCESS:
+                        # paho retries QoS 1/2 itself after a reconnect
+                        self._inflight[info.mid] = qos
+                if qos > 0 or info.rc == MQTT_ERR_SUCCESS:
+                    break
+                # QoS 0 hit a dead socket: wait for reconnect and resend
+                time.sleep(0.1)
+            else:
+                self._discard()
+                self._drain()
+                break
+
+            with self._cond:
+                self._pending -= 1
+                self.stats["sent"] += 1
+                self._cond.notify_all()
+
+    def flush(self, timeout=10):
+        """Wait until every queued message is written and every QoS 1/2 ack is back"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def is_connected(self):
+        return self._connected.is_set()
+
+    def close(self, timeout=10):
+        """Flush outstanding messages for at most `timeout` seconds, then disconnect"""
+        if self._closed:
+            return
+        deadline = time.monotonic() + timeout
+        if not self.flush(timeout):
+            print(f"WARNING: publisher closed with {self._pending} queued, "
+                  f"{len(self._inflight)} unacknowledged messages")
+        self._closed = True
+        self._closing.set()
+        with self._cond:
+            self._cond.notify_all()
+        try:
+            self._queue.put_nowait(_STOP)
+        except queue.Full:
+            # The sender checks _closing before every message and drops the rest
+            pass
+        self._sender.join(max(0.1, deadline - time.monotonic()))
+        self.client.disconnect()
+        # loop_stop() joins paho's network thread, which can sit in a reconnect
+        # sleep or a blocking connect; don't let that stretch past the timeout
+        stopper = threading.Thread(target=self.client.loop_stop, daemon=True)
+        stopper.start()
+        stopper.join(max(0.1, deadline - time.monotonic()))
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+def get_publisher():
+    """Return the process-wide publisher, creating it on first use"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None or _publisher._closed:
+            _publisher = PersistentPublisher()
+        return _publisher
+
+if __name__ == "__main__":
+    publisher = get_publisher()
+    start = time.perf_counter()
+    for i in range(1000):
+        publisher.publish("sensors/benchmark", {"seq": i, "value": 20 + i % 10}, qos=1)
+    publisher.flush(timeout=30)
+    elapsed = time.perf_counter() - start
+    print(f"Published 1000 QoS 1 messages in {elapsed:.2f}s ({1000 / elapsed:.0f} msg/s)")
+    print(publisher.stats)
@@ -0,0 +1,328 @@
+"""
+Soak test: simulator, automation engine and dashboard against local stand-ins
+
+Drives sustained sensor traffic through a stand-in MQTT broker and an
+in-memory InfluxDB stand-in for --duration seconds, injecting broker
+disconnects and slow DB writes along the way. Exits non-zero if RSS
+grows past a bound, sustained msg/s drops below the baseline or p99
+latency regresses.
+
+    python soak_test.py --duration 600 --rate 1000
+    python soak_test.py --baseline soak_baseline.json --save-baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from contextlib import redirect_stdout
+from datetime import datetime
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+SIMULATOR_DIR = os.path.join(os.path.dirname(CODE_DIR), "Simulator")
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # No /proc: fall back to peak RSS, which still catches steady growth
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+class LatencyReservoir:
+    """Fixed-size uniform sample of latencies, so recording never grows memory"""
+
+    def __init__(self, size=50000, seed=0):
+        self.size = size
+        self.samples = array("d", bytes(8 * size))
+        self.count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            if self.count < self.size:
+                self.samples[self.count] = seconds
+            else:
+                slot = self._random.randrange(self.count + 1)
+                if slot < self.size:
+                    self.samples[slot] = seconds
+            self.count += 1
+
+    def percentile(self, p):
+        with self._lock:
+            ordered = sorted(self.samples[:min(self.count, self.size)])
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+class StandInDB:
+    """LocalTSDB behind a write API that can be slowed down on demand
+
+    The store is replaced every `retention` seconds, like a short bucket
+    retention policy, so the stand-in's own data does not count as a leak.
+    """
+
+    def __init__(self, retention=10.0, seed=0):
+        from local_tsdb import LocalTSDB
+
+        self._factory = LocalTSDB
+        self.store = LocalTSDB()
+        self.retention = retention
+        self._rotated_at = time.monotonic()
+        self._random = random.Random(seed)
+        self.slow_until = 0.0
+        self.slow_ratio = 0.0
+        self.slow_delay = 0.0
+        self.writes = 0
+        self.slow_writes = 0
+
+    def slow_down(self, seconds, ratio, delay):
+        """Make `ratio` of the writes in the next `seconds` take `delay` longer"""
+        self.slow_ratio, self.slow_delay = ratio, delay
+        self.slow_until = time.monotonic() + seconds
+
+    def write(self, bucket=None, org=None, record=None, **kwargs):
+        now = time.monotonic()
+        if now < self.slow_until and self._random.random() < self.slow_ratio:
+            time.sleep(self.slow_delay)
+            self.slow_writes += 1
+        if now - self._rotated_at >= self.retention:
+            self.store = self._factory()
+            self._rotated_at = now
+        self.store.write(bucket, org, record)
+        self.writes += 1
+
+    def write_api(self, **kwargs):
+        return self
+
+    def close(self):
+        pass
+
+def probe(handler, reservoir, clock):
+    """Wrap a handle_message(msg) method to record latency from the payload timestamp"""
+    def handle_message(msg):
+        handler(msg)
+        try:
+            sent = datetime.fromisoformat(json.loads(msg.payload)["timestamp"])
+        except (ValueError, KeyError, TypeError):
+            return
+        reservoir.add((clock() - sent).total_seconds())
+    return handle_message
+
+def drive(simulator, rate, stop):
+    """Publish readings round-robin across the simulator's devices at `rate` msg/s"""
+    interval = 1.0 / rate
+    devices = simulator.devices
+    next_at = time.monotonic()
+    i = 0
+    while not stop.is_set():
+        device = devices[i % len(devices)]
+        i += 1
+        simulator.publish_data(device, device.read())
+        next_at += interval
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -1.0:
+            # More than a second behind: resume the schedule rather than burst forever
+            next_at = time.monotonic()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=60, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=10, help="seconds before baselines are taken")
+    parser.add_argument("--rate", type=float, default=1000, help="sensor messages per second")
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=22.0,
+                        help="automation temperature threshold; lower means more commands")
+    parser.add_argument("--fault-interval", type=float, default=20,
+                        help="seconds between injected faults, alternating disconnect/slow DB")
+    parser.add_argument("--slow-window", type=float, default=5)
+    parser.add_argument("--slow-ratio", type=float, default=0.01)
+    parser.add_argument("--slow-write-ms", type=float, default=20)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50)
+    parser.add_argument("--min-throughput", type=float, default=None,
+                        help="msg/s handled by the automation engine (default 75%% of --rate)")
+    parser.add_argument("--max-p99-ms", type=float, default=250)
+    parser.add_argument("--max-missed-rate", type=float, default=0.05,
+                        help="fraction of automation commands that may never reach an actuator")
+    parser.add_argument("--baseline", help="JSON file with throughput and p99 from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed regression against --baseline")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write this run's results to --baseline when it passes")
+    return parser.parse_args()
+
+def configure(port):
+    """Point every service at the stand-ins before their modules read the config"""
+    os.environ.update({"MQTT_BROKER": "127.0.0.1", "MQTT_PORT": str(port),
+                       "MQTT_USERNAME": "", "MQTT_PASSWORD": "",
+                       "INFLUXDB_URL": "memory://"})
+    from iot_core import get_config
+    get_config.cache_clear()
+    sys.path.append(SIMULATOR_DIR)
+
+def check(results, name, ok, detail):
+    results.append((name, ok, detail))
+
+def main():
+    args = parse_args()
+    min_throughput = args.min_throughput or args.rate * 0.75
+    from mqtt_standin import StandInBroker
+
+    broker = StandInBroker().start()
+    configure(broker.port)
+    from iot_simulator import IoTSimulator, TemperatureSensor, HumiditySensor, SmartSwitch
+    from home_automation import HomeAutomation
+    from automation_dashboard import AutomationDashboard
+
+    sensor_latency = LatencyReservoir()
+    command_latency = LatencyReservoir()
+    out = sys.stdout
+    print(f"Soak test: {args.rate:.0f} msg/s from {args.devices} devices for "
+          f"{args.duration:.0f}s (+{args.warmup:.0f}s warmup), broker on port {broker.port}")
+
+    # The services print per message; keep that off the terminal
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        db = StandInDB()
+        simulator = IoTSimulator()
+        simulator.setup_mqtt()
+        simulator.influx_client = simulator.write_api = db
+        for i in range(args.devices):
+            sensor = TemperatureSensor if i % 2 == 0 else HumiditySensor
+            simulator.add_device(sensor(f"soak-{i:04d}", f"room-{i % 10}"))
+        # One AC per room closes the loop; they only act on commands, not driven reads
+        actuators = simulator.setup_actuators(
+            [SmartSwitch(f"soak-ac-{room}", f"room-{room}", device_type="ac", toggle_probability=0)
+             for room in range(10)])
+
+        automation = HomeAutomation()
+        automation.temperature_threshold = args.threshold
+        automation.handle_message = probe(automation.handle_message, sensor_latency,
+                                          datetime.utcnow)
+        dashboard = AutomationDashboard()
+        dashboard.handle_message = probe(dashboard.handle_message, command_latency,
+                                         datetime.now)
+
+        stop = threading.Event()
+        driver = threading.Thread(target=drive, args=(simulator, args.rate, stop), daemon=True)
+        driver.start()
+
+        start = time.monotonic()
+        end = start + args.warmup + args.duration
+        warm = None
+        rss_samples = []
+        next_fault = start + args.warmup + args.fault_interval
+        faults = 0
+        disconnects = 0
+        next_report = None
+
+        while time.monotonic() < end:
+            time.sleep(1)
+            now = time.monotonic()
+            handled = automation.metrics.counters.get("messages_in", 0)
+            if warm is None and now - start >= args.warmup:
+                warm = (now, handled, rss_bytes())
+                next_report = now + 10
+            if warm is None:
+                continue
+            rss_samples.append(rss_bytes())
+
+            if now >= next_fault:
+                faults += 1
+                if faults % 2:
+                    broker.drop_clients()
+                    disconnects += 1
+                    fault = "broker disconnect"
+                else:
+                    db.slow_down(args.slow_window, args.slow_ratio, args.slow_write_ms / 1000)
+                    fault = f"slow DB writes for {args.slow_window:.0f}s"
+                next_fault += args.fault_interval
+                print(f"[{now - start:5.0f}s] injected {fault}", file=out)
+
+            if now >= next_report:
+                next_report += 10
+                rate = (handled - warm[1]) / (now - warm[0])
+                print(f"[{now - start:5.0f}s] {rate:7.0f} msg/s  "
+                      f"p99 {sensor_latency.percentile(99):6.1f}ms  "
+                      f"RSS {rss_samples[-1] / 1e6:6.1f}MB  "
+                      f"events {len(dashboard.automation_events)}", file=out)
+
+        measured = time.monotonic() - warm[0]
+        handled = automation.metrics.counters.get("messages_in", 0) - warm[1]
+        stop.set()
+        driver.join()
+        # A disconnect right before the end may still be inside paho's reconnect delay
+        clients = (simulator.mqtt_client, automation.mqtt_client, dashboard.mqtt_client)
+        deadline = time.monotonic() + 15
+        while not all(c.is_connected() for c in clients) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        connected = [client.is_connected() for client in clients]
+        simulator.stop()
+        automation.stop()
+        dashboard.stop()
+    broker.stop()
+
+    throughput = handled / measured
+    # Median of the last few samples, so a transient spike at the end does not decide it
+    tail = sorted(rss_samples[-5:])
+    growth_mb = (tail[len(tail) // 2] - warm[2]) / 1e6
+    p99 = sensor_latency.percentile(99)
+    p99_command = command_latency.percentile(99)
+    p99_actuation = actuators.percentile(99)
+    missed_rate = actuators.missed_rate()
+
+    results = []
+    check(results, "RSS growth", growth_mb <= args.max_rss_growth_mb,
+          f"{growth_mb:+.1f}MB (limit {args.max_rss_growth_mb:.0f}MB)")
+    check(results, "sustained throughput", throughput >= min_throughput,
+          f"{throughput:.0f} msg/s (minimum {min_throughput:.0f})")
+    check(results, "p99 sensor -> automation", p99 <= args.max_p99_ms,
+          f"{p99:.1f}ms (limit {args.max_p99_ms:.0f}ms)")
+    check(results, "p99 command -> dashboard", p99_command <= args.max_p99_ms,
+          f"{p99_command:.1f}ms (limit {args.max_p99_ms:.0f}ms)")
+    check(results, "p99 command -> actuation", p99_actuation <= args.max_p99_ms,
+          f"{p99_actuation:.1f}ms (limit {args.max_p99_ms:.0f}ms)")
+    check(results, "missed commands", missed_rate <= args.max_missed_rate,
+          f"{actuators.stats['missed']} of {actuators.stats['commands'] + actuators.stats['missed']} "
+          f"({missed_rate:.2%}, limit {args.max_missed_rate:.0%})")
+    check(results, "reconnected after disconnects", all(connected),
+          f"{disconnects} disconnects, clients connected: {connected}")
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        floor = baseline["throughput"] * (1 - args.tolerance)
+        ceiling = baseline["p99_ms"] * (1 + args.tolerance)
+        check(results, "throughput vs baseline", throughput >= floor,
+              f"{throughput:.0f} msg/s (baseline {baseline['throughput']:.0f}, floor {floor:.0f})")
+        check(results, "p99 vs baseline", p99 <= ceiling,
+              f"{p99:.1f}ms (baseline {baseline['p99_ms']:.1f}ms, ceiling {ceiling:.1f}ms)")
+
+    print(f"\nHandled {handled} sensor messages in {measured:.0f}s; "
+          f"{db.writes} DB writes ({db.slow_writes} slowed), "
+          f"{dashboard.metrics.counters.get('messages_in', 0)} commands seen by the dashboard")
+    print(f"Actuators: {actuators.summary()}")
+    for name, ok, detail in results:
+        print(f"{'✓' if ok else '✗'} {name}: {detail}")
+
+    passed = all(ok for _, ok, _ in results)
+    if passed and args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"throughput": round(throughput, 1), "p99_ms": round(p99, 3),
+                       "rate": args.rate, "devices": args.devices}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    print("PASS" if passed else "FAIL")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())